@@ -0,0 +1,204 @@
+''' This module contains the approximate nearest
+neighbour index used to find the words similar
+to an answer without scanning the whole vocabulary.
+
+Build it once, offline, from the backend directory:
+    python -m ann_index --trees 10 --leaf-size 64
+'''
+import argparse
+import heapq
+import json
+import os
+
+import numpy as np
+
+# arrays of the forest, each saved as <path>/<name>.npy
+FOREST_ARRAYS = ["normals", "offsets", "children", "leaf_bounds", "leaf_items", "roots"]
+
+
+class RandomProjectionForest:
+    ''' A forest of random projection trees over
+    unit-normalized vectors. Every internal node
+    splits its vectors by a hyperplane half way
+    between two random vectors of the node.
+
+    Nodes are referenced by ints: a value >= 0 is
+    the row of an internal node, a value < 0 is
+    the leaf number -(value + 1)
+    '''
+
+    def __init__(self, normals, offsets, children, leaf_bounds, leaf_items, roots, search_k=2000):
+        '''
+        Params:
+            * normals : (internal nodes x dim) float32, hyperplane normals
+            * offsets : (internal nodes) float32, hyperplane offsets
+            * children : (internal nodes x 2) int32, left and right child references
+            * leaf_bounds : (leaves x 2) int32, [start, end) of each leaf in leaf_items
+            * leaf_items : int32, vector ids of all the leaves
+            * roots : (trees) int32, root reference of each tree
+            * search_k : int, default number of candidates inspected per query
+        '''
+        self.normals = normals
+        self.offsets = offsets
+        self.children = children
+        self.leaf_bounds = leaf_bounds
+        self.leaf_items = leaf_items
+        self.roots = roots
+        self.search_k = search_k
+
+    @classmethod
+    def build(cls, vectors, n_trees=10, leaf_size=64, seed=0):
+        ''' Builds the forest over the rows of vectors,
+        which should be unit-normalized
+        '''
+        rng = np.random.default_rng(seed)
+        normals, offsets, children = [], [], []
+        leaf_bounds, leaf_items = [], []
+        num_leaf_items = 0
+
+        def add_leaf(items):
+            nonlocal num_leaf_items
+            leaf_bounds.append((num_leaf_items, num_leaf_items + len(items)))
+            leaf_items.append(items)
+            num_leaf_items += len(items)
+            return -len(leaf_bounds)
+
+        def add_node():
+            normals.append(None)
+            offsets.append(0.0)
+            children.append([0, 0])
+            return len(normals) - 1
+
+        roots = []
+        for _ in range(n_trees):
+            all_items = np.arange(len(vectors), dtype=np.int32)
+            if len(all_items) <= leaf_size:
+                roots.append(add_leaf(all_items))
+                continue
+
+            roots.append(add_node())
+            stack = [(roots[-1], all_items)]
+            while stack:
+                node, items = stack.pop()
+
+                a, b = rng.choice(items, size=2, replace=False)
+                normal = vectors[a] - vectors[b]
+                offset = float(normal @ (vectors[a] + vectors[b])) / 2
+                right = vectors[items] @ normal > offset
+
+                if right.all() or not right.any():
+                    # duplicate vectors, fall back to a random split
+                    normal = np.zeros_like(normal)
+                    offset = 0.0
+                    right = rng.random(len(items)) < 0.5
+
+                normals[node] = normal
+                offsets[node] = offset
+                for side, side_items in enumerate((items[~right], items[right])):
+                    if len(side_items) <= leaf_size:
+                        children[node][side] = add_leaf(side_items)
+                    else:
+                        children[node][side] = add_node()
+                        stack.append((children[node][side], side_items))
+
+        dim = vectors.shape[1]
+        return cls(
+            np.array(normals, dtype=np.float32).reshape(-1, dim),
+            np.array(offsets, dtype=np.float32),
+            np.array(children, dtype=np.int32).reshape(-1, 2),
+            np.array(leaf_bounds, dtype=np.int32).reshape(-1, 2),
+            np.concatenate(leaf_items).astype(np.int32),
+            np.array(roots, dtype=np.int32),
+        )
+
+    def save(self, path):
+        ''' Saves every array as a .npy file in
+        the directory path
+        '''
+        os.makedirs(path, exist_ok=True)
+        for name in FOREST_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), 'w') as meta_file:
+            json.dump({"search_k": self.search_k}, meta_file)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        ''' Loads a saved forest, memory-mapping
+        its arrays read-only by default
+        '''
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in FOREST_ARRAYS]
+        with open(os.path.join(path, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        return cls(*arrays, search_k=meta["search_k"])
+
+    def get_candidates(self, query, search_k=None):
+        ''' Returns the ids of the vectors in the
+        leaves closest to the query, visiting the
+        leaves of all trees by their margin until
+        search_k candidates are found
+        '''
+        search_k = search_k or self.search_k
+
+        # max-heap on the smallest margin along the path to a node
+        heap = [(-np.inf, int(root)) for root in self.roots]
+        candidates = []
+        num_candidates = 0
+
+        while heap and num_candidates < search_k:
+            neg_priority, node = heapq.heappop(heap)
+
+            if node < 0:
+                start, end = self.leaf_bounds[-node - 1]
+                candidates.append(self.leaf_items[start:end])
+                num_candidates += end - start
+                continue
+
+            margin = float(self.normals[node] @ query) - float(self.offsets[node])
+            left, right = self.children[node]
+            heapq.heappush(heap, (max(neg_priority, -margin), int(right)))
+            heapq.heappush(heap, (max(neg_priority, margin), int(left)))
+
+        if not candidates:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(candidates))
+
+    def most_similar(self, model, word, topn=15, search_k=None):
+        ''' Returns the topn words of the model most
+        similar to word, most similar first. Raises
+        KeyError if the model does not know the word,
+        like KeyedVectors.similar_by_word
+        '''
+        index = model.key_to_index[word]
+        query = np.asarray(model.vectors[index], dtype=np.float32) / model.norms[index]
+
+        candidates = self.get_candidates(query, search_k)
+        # the model may be a pruned store with fewer words than the index
+        candidates = candidates[(candidates != index) & (candidates < len(model.index_to_key))]
+
+        # exact cosine similarity over the candidates only
+        scores = (np.asarray(model.vectors[candidates], dtype=np.float32) @ query) / model.norms[candidates]
+        top = np.argsort(-scores)[:topn]
+
+        return [model.index_to_key[i] for i in candidates[top]]
+
+
+def main():
+    from model_registry import get_ann_path, get_full_glove_model
+
+    parser = argparse.ArgumentParser(description="Builds the ANN index of the GloVe model")
+    parser.add_argument("--trees", type=int, default=10)
+    parser.add_argument("--leaf-size", type=int, default=64)
+    parser.add_argument("--search-k", type=int, default=2000)
+    args = parser.parse_args()
+
+    model = get_full_glove_model()
+    vectors = np.asarray(model.vectors / model.norms[:, np.newaxis], dtype=np.float32)
+
+    forest = RandomProjectionForest.build(vectors, n_trees=args.trees, leaf_size=args.leaf_size)
+    forest.search_k = args.search_k
+    forest.save(get_ann_path())
+    print(f"saved {len(forest.roots)} trees, {len(forest.leaf_bounds)} leaves to {get_ann_path()}")
+
+
+if __name__ == '__main__':
+    main()
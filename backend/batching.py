@@ -0,0 +1,133 @@
+''' This module contains the micro-batching worker
+which runs the summarization requests of concurrent
+handlers together, as padded batches, on a shared
+summarization pipeline
+'''
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+
+class SummaryRequest:
+
+    def __init__(self, text, max_length, min_length):
+        self.text = text
+        self.max_length = max_length
+        self.min_length = min_length
+        self.future = Future()
+
+
+class MicroBatcher:
+    ''' A stand-in for a summarization pipeline: every
+    text it is called with is queued, and a worker
+    thread collects the queued texts for up to
+    max_wait seconds, groups them by generation
+    lengths and summarizes each group as one batch
+    '''
+
+    def __init__(self, summarizer, max_batch_size=8, max_wait=0.005):
+        '''
+        Params:
+            * summarizer : transformers summarization pipeline
+            * max_batch_size : int, max texts summarized at once
+            * max_wait : float, seconds a batch waits for more texts once it has one
+        '''
+        self.summarizer = summarizer
+        self.tokenizer = summarizer.tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.requests = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+
+        self.num_requests = 0
+        self.num_batches = 0
+
+    def __call__(self, inputs, max_length, min_length=0, **kwargs):
+        ''' Returns [{'summary_text': str}] for the inputs,
+        a text or a list of texts, like the pipeline.
+        The other keyword arguments are ignored: the
+        batches are always greedy and truncated
+        '''
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        futures = [self.submit(text, max_length, min_length) for text in texts]
+        return [{'summary_text': future.result()} for future in futures]
+
+    def submit(self, text, max_length, min_length=0):
+        ''' Queues the text and returns the Future
+        of its summary
+        '''
+        self.start()
+        request = SummaryRequest(text, max_length, min_length)
+        self.requests.put(request)
+        return request.future
+
+    def start(self):
+        # started on the first request, so that it runs in the process serving the requests
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, daemon=True)
+                self.worker.start()
+
+    def collect_batch(self):
+        ''' Waits for a request, then returns it with
+        the requests queued within max_wait, up to
+        max_batch_size of them
+        '''
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            groups = defaultdict(list)
+            for request in self.collect_batch():
+                # the generation lengths apply to a whole batch
+                groups[(request.max_length, request.min_length)].append(request)
+
+            for (max_length, min_length), requests in groups.items():
+                self.run_batch(requests, max_length, min_length)
+
+    def run_batch(self, requests, max_length, min_length):
+        try:
+            outputs = self.summarizer(
+                [request.text for request in requests],
+                max_length=max_length,
+                min_length=min_length,
+                do_sample=False,
+                truncation=True,
+                batch_size=len(requests),
+            )
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        with self.lock:
+            self.num_requests += len(requests)
+            self.num_batches += 1
+        for request, output in zip(requests, outputs):
+            request.future.set_result(output['summary_text'])
+
+    def stats(self):
+        ''' Returns the counters of the worker,
+        for monitoring
+        '''
+        with self.lock:
+            return {
+                "queued": self.requests.qsize(),
+                "requests": self.num_requests,
+                "batches": self.num_batches,
+                "mean_batch_size": self.num_requests / self.num_batches if self.num_batches else 0.0,
+            }
@@ -0,0 +1,55 @@
+''' Measures the recall and latency of the ANN
+index against the exact similar_by_word search
+for a range of search_k values. Build the index
+first with `python -m ann_index`.
+
+Run from the backend directory:
+    python -m benchmarks.ann_recall --queries 200 --search-k 500 1000 2000 5000
+'''
+import argparse
+import random
+import statistics
+import time
+
+from model_registry import get_ann_index, get_glove_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--topn", type=int, default=15)
+    parser.add_argument("--search-k", type=int, nargs="+", default=[500, 1000, 2000, 5000])
+    parser.add_argument("--vocab", type=int, default=50000,
+                        help="query words are drawn from this many most frequent words")
+    args = parser.parse_args()
+
+    model = get_glove_model()
+    index = get_ann_index()
+    if index is None:
+        raise SystemExit("No ANN index found, build it with: python -m ann_index")
+
+    rng = random.Random(0)
+    words = rng.sample(model.index_to_key[:args.vocab], args.queries)
+
+    exact = dict()
+    timings = []
+    for word in words:
+        start = time.perf_counter()
+        exact[word] = {w for w, _ in model.similar_by_word(word, topn=args.topn)}
+        timings.append(time.perf_counter() - start)
+    print(f"{'exact':>10}: recall 1.000, median latency {statistics.median(timings) * 1000:.2f}ms")
+
+    for search_k in args.search_k:
+        timings = []
+        hits = 0
+        for word in words:
+            start = time.perf_counter()
+            found = index.most_similar(model, word, topn=args.topn, search_k=search_k)
+            timings.append(time.perf_counter() - start)
+            hits += len(exact[word].intersection(found))
+        recall = hits / (args.topn * len(words))
+        print(f"{search_k:>10}: recall {recall:.3f}, median latency {statistics.median(timings) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+''' Compares the memory used by distractor lookups
+with the full float32 GloVe model and with the
+compact float16 store at several memory budgets,
+and how much the neighbours found change. Build
+the store first with `python -m compact_embeddings`.
+
+Run from the backend directory:
+    python -m benchmarks.compact_embeddings --budgets 20 40 80
+'''
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+
+TOPN = 15
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 2 ** 20
+
+
+def query_words(num_queries):
+    ''' Frequent words, like most quiz answers '''
+    from model_registry import get_full_glove_model
+    rng = random.Random(0)
+    return rng.sample(get_full_glove_model().index_to_key[:20000], num_queries)
+
+
+def run_store(budget_mb, words):
+    ''' Finds the neighbours of the words in a fresh
+    process state and returns them with the RSS
+    '''
+    from model_registry import get_compact_path, get_full_glove_model
+    from compact_embeddings import CompactKeyedVectors
+
+    if budget_mb is None:
+        model = get_full_glove_model()
+    else:
+        model = CompactKeyedVectors.load(get_compact_path(), memory_budget_mb=budget_mb)
+
+    neighbours = {word: [w for w, _ in model.similar_by_word(word, topn=TOPN)] for word in words}
+    return {"rss_mb": round(current_rss_mb(), 1), "neighbours": neighbours}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budgets", type=float, nargs="+", default=[20, 40, 80],
+                        help="memory budgets of the compact store, in MB")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--budget", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--full", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.full or args.budget is not None:
+        words = json.loads(sys.stdin.read())
+        print(json.dumps(run_store(None if args.full else args.budget, words)))
+        return
+
+    words = query_words(args.queries)
+
+    def run(flag):
+        # every store runs in a fresh interpreter so the RSS numbers are not mixed
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.compact_embeddings"] + flag,
+            input=json.dumps(words), check=True, capture_output=True, text=True
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    full = run(["--full"])
+    print(f"{'full float32':>16}: rss {full['rss_mb']} MB")
+
+    for budget in args.budgets:
+        compact = run(["--budget", str(budget)])
+        overlap = sum(
+            len(set(full["neighbours"][word]).intersection(compact["neighbours"][word]))
+            for word in words
+        ) / (TOPN * len(words))
+        print(f"{f'float16 {budget:g} MB':>16}: rss {compact['rss_mb']} MB, "
+              f"neighbour overlap with full {overlap:.3f}")
+
+
+if __name__ == '__main__':
+    main()
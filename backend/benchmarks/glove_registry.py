@@ -0,0 +1,84 @@
+''' Compares the startup time and memory of
+loading GloVe once per quiz (the old behaviour)
+against the shared memory-mapped registry.
+
+Run from the backend directory:
+    python -m benchmarks.glove_registry --calls 5
+'''
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def current_rss_mb():
+    ''' Returns the resident set size of this process in MB '''
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * resource.getpagesize() / 2 ** 20
+
+
+def peak_rss_mb():
+    ''' Returns the peak resident set size of this process in MB '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, calls):
+    ''' Loads the model `calls` times with the given
+    strategy and returns the timings and memory usage
+    '''
+    if mode == "per-call":
+        import gensim.downloader as api
+
+        def load():
+            return api.load("glove-wiki-gigaword-100")
+    else:
+        from model_registry import export_glove_model, get_glove_model
+        # the on-disk export is a one-off step, keep it out of the timings
+        export_glove_model()
+
+        def load():
+            return get_glove_model()
+
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        model = load()
+        model.similar_by_word("science", topn=15)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "first_call_s": round(timings[0], 3),
+        "mean_later_call_s": round(sum(timings[1:]) / max(len(timings) - 1, 1), 4),
+        "rss_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--mode", choices=["per-call", "registry"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.calls)))
+        return
+
+    # every mode runs in a fresh interpreter so the memory numbers are not mixed
+    for mode in ("per-call", "registry"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.glove_registry", "--mode", mode, "--calls", str(args.calls)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['mode']:>9}: first call {result['first_call_s']}s, "
+              f"later calls {result['mean_later_call_s']}s, "
+              f"rss {result['rss_mb']} MB (peak {result['peak_rss_mb']} MB)")
+
+
+if __name__ == '__main__':
+    main()
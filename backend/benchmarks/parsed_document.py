@@ -0,0 +1,70 @@
+''' Measures the per-document time saved by parsing
+a document once into a ParsedDocument, against the
+old flow where every stage split and tokenized the
+text again on its own.
+
+Run from the backend directory:
+    python -m benchmarks.parsed_document --sentences 500 [--doc notes.txt]
+'''
+import argparse
+import time
+
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+from benchmarks.sample_text import load_document
+from question_generation_main import QuestionGeneration
+
+
+def legacy_preprocessing(q_gen, text):
+    ''' The tokenization and ner passes of the old
+    flow, before the tf-idf and distractor stages
+    '''
+    extractor = q_gen.question_extractor
+    document = q_gen.clean_text(text)
+
+    # QuestionExtractor.get_candidate_entities
+    list({ent.text for ent in extractor.ner_tagger(document).ents})
+
+    # QuestionExtractor.set_tfidf_scores and get_filtered_sentences
+    sent_tokenize(document)
+    [extractor.filter_sentence(sentence) for sentence in sent_tokenize(document)]
+
+    # IncorrectAnswerGenerator.__init__
+    all_words = []
+    for sent in sent_tokenize(document):
+        all_words.extend(word_tokenize(sent))
+    list(set(all_words))
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--doc", help="text file to use instead of a synthetic document")
+    args = parser.parse_args()
+
+    text = load_document(args.doc, args.sentences)
+    q_gen = QuestionGeneration(10, 4)
+
+    legacy = best_of(lambda: legacy_preprocessing(q_gen, text), args.repeats)
+    single_pass = best_of(lambda: q_gen.parse_document(text), args.repeats)
+    end_to_end = best_of(lambda: q_gen.generate_questions_dict(text), args.repeats)
+
+    print(f"document: {len(text)} chars")
+    print(f"preprocessing, old flow:    {legacy * 1000:.1f}ms")
+    print(f"preprocessing, single pass: {single_pass * 1000:.1f}ms")
+    print(f"saved per document:         {(legacy - single_pass) * 1000:.1f}ms")
+    print(f"end to end quiz generation: {end_to_end * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
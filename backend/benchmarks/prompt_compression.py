@@ -0,0 +1,77 @@
+''' Compares the quiz generated by Gemini from the
+full text with the one generated from the text
+compressed to its most salient sentences: prompt
+size, latency and question quality. Without
+--gemini, only the compression itself is measured.
+
+Run from the backend directory:
+    python -m benchmarks.prompt_compression --budget 2000 [--doc notes.txt] [--gemini]
+'''
+import argparse
+import os
+import time
+
+from benchmarks.sample_text import load_document
+from gemini_quiz import GeminiQuizGenerator, QuizGenerationError, estimate_tokens
+from prompt_compression import SalienceCompressor
+
+
+def question_quality(questions, text):
+    ''' Returns the number of valid questions and
+    the share of them whose answer is found in the
+    original text
+    '''
+    lowered = text.lower()
+    grounded = sum(1 for question in questions.values() if question["answer"].lower() in lowered)
+    return len(questions), grounded / len(questions) if questions else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--budget", type=int, default=2000, help="token budget of the compressed text")
+    parser.add_argument("--doc", help="text file to use instead of a synthetic document")
+    parser.add_argument("--gemini", action="store_true", help="also generate both quizzes with Gemini")
+    parser.add_argument("--model", default="gemini-1.5-pro-latest")
+    args = parser.parse_args()
+
+    text = load_document(args.doc, args.sentences)
+    compressor = SalienceCompressor(args.budget)
+
+    start = time.perf_counter()
+    compressed = compressor.compress(text)
+    compression_time = time.perf_counter() - start
+
+    print(f"full text:       {len(text)} chars, ~{estimate_tokens(text)} tokens")
+    print(f"compressed text: {len(compressed)} chars, ~{estimate_tokens(compressed)} tokens "
+          f"({len(compressed) / len(text):.1%})")
+    print(f"compression:     {compression_time * 1000:.1f}ms")
+
+    if not args.gemini:
+        return
+
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    genai.configure(api_key=os.getenv('gemini_api_key'))
+    model = genai.GenerativeModel(model_name=args.model)
+
+    for name, prompt_text in (("full", text), ("compressed", compressed)):
+        # no cache and no chunks, to time a single prompt of each text
+        generator = GeminiQuizGenerator(model, args.model)
+        start = time.perf_counter()
+        try:
+            questions = generator.generate_questions(prompt_text)
+        except QuizGenerationError as e:
+            print(f"{name:>10}: failed, {e}")
+            continue
+        latency = time.perf_counter() - start
+
+        num_questions, grounded = question_quality(questions, text)
+        print(f"{name:>10}: {latency:.2f}s, {num_questions} valid questions, "
+              f"{grounded:.0%} of the answers found in the document")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+''' Helpers shared by the benchmarks to get
+an input document, either from a file given on
+the command line or generated synthetically
+'''
+import random
+
+SUBJECTS = [
+    "Marie Curie", "Isaac Newton", "The Roman Empire", "Photosynthesis", "The French Revolution",
+    "Albert Einstein", "The Amazon river", "Mount Everest", "The United Nations", "Charles Darwin",
+]
+VERBS = ["changed", "influenced", "described", "explained", "shaped", "transformed", "measured"]
+OBJECTS = [
+    "the theory of gravity", "modern chemistry", "the economy of Europe", "plant biology",
+    "the politics of France", "our view of space and time", "the climate of South America",
+    "the study of evolution", "international relations after 1945", "the history of science",
+]
+PLACES = ["Paris", "London", "Berlin", "Cambridge", "Geneva", "Rome", "New York"]
+
+
+def synthetic_document(num_sentences, seed=0):
+    ''' Returns a document made of `num_sentences`
+    random factual looking sentences with entities
+    '''
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(num_sentences):
+        sentences.append(
+            f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} "
+            f"in {rng.choice(PLACES)} around {rng.randint(1500, 2020)}."
+        )
+    return " ".join(sentences)
+
+
+def load_document(path=None, num_sentences=200):
+    ''' Returns the text of the file at `path`,
+    or a synthetic document when no path is given
+    '''
+    if path:
+        with open(path, 'r', encoding="utf-8") as file:
+            return file.read()
+    return synthetic_document(num_sentences)
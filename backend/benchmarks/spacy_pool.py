@@ -0,0 +1,69 @@
+''' Compares loading the full en_core_web_md
+pipeline for every extractor against the shared
+NER-only pool, both for load time and for the
+per-document NER latency.
+
+Run from the backend directory:
+    python -m benchmarks.spacy_pool --extractors 5 [--doc notes.txt]
+'''
+import argparse
+import statistics
+import time
+
+import spacy
+
+from benchmarks.sample_text import load_document
+from model_registry import NER_UNUSED_PIPES, SPACY_MODEL_NAME, get_ner_model
+
+
+def time_call(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def ner_latency(nlp, document, repeats):
+    ''' Returns the median time of extracting the
+    entities of `document` and the entities found
+    '''
+    timings = []
+    for _ in range(repeats):
+        doc, elapsed = time_call(lambda: nlp(document))
+        timings.append(elapsed)
+    return statistics.median(timings), {ent.text for ent in doc.ents}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--extractors", type=int, default=5,
+                        help="number of QuestionExtractor constructions to simulate")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--doc", help="text file to use instead of a synthetic document")
+    args = parser.parse_args()
+
+    document = load_document(args.doc)
+
+    # old behaviour: the full pipeline is loaded by every extractor
+    full_load = 0.0
+    for _ in range(args.extractors):
+        full_nlp, elapsed = time_call(lambda: spacy.load(SPACY_MODEL_NAME))
+        full_load += elapsed
+
+    # new behaviour: the trimmed pipeline is loaded by the first extractor only
+    pooled_load = 0.0
+    for _ in range(args.extractors):
+        pooled_nlp, elapsed = time_call(get_ner_model)
+        pooled_load += elapsed
+
+    full_latency, full_ents = ner_latency(full_nlp, document, args.repeats)
+    pooled_latency, pooled_ents = ner_latency(pooled_nlp, document, args.repeats)
+
+    print(f"document: {len(document)} chars, disabled pipes: {', '.join(NER_UNUSED_PIPES)}")
+    print(f"model load for {args.extractors} extractors: full {full_load:.2f}s, pooled {pooled_load:.2f}s")
+    print(f"ner latency per document: full {full_latency * 1000:.1f}ms, pooled {pooled_latency * 1000:.1f}ms")
+    print(f"pipes: full {full_nlp.pipe_names}, pooled {pooled_nlp.pipe_names}")
+    print(f"same entities: {full_ents == pooled_ents}")
+
+
+if __name__ == '__main__':
+    main()
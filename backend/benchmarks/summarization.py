@@ -0,0 +1,47 @@
+''' Measures the throughput of the chunked
+summarization of whole documents on CPU, in pages
+per second, for a range of batch sizes.
+
+Run from the backend directory:
+    python -m benchmarks.summarization --pages 20 --batch-sizes 1 4 8 [--doc notes.txt]
+'''
+import argparse
+import time
+
+from transformers import pipeline
+
+from benchmarks.sample_text import load_document
+from summarization import ChunkedSummarizer
+
+# a synthetic page is about 300 words
+SENTENCES_PER_PAGE = 25
+CHARS_PER_PAGE = 1800
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-length", type=int, default=130)
+    parser.add_argument("--model", default="facebook/bart-large-cnn")
+    parser.add_argument("--doc", help="text file to use instead of a synthetic document")
+    args = parser.parse_args()
+
+    text = load_document(args.doc, args.pages * SENTENCES_PER_PAGE)
+    pages = len(text) / CHARS_PER_PAGE
+    summarizer = pipeline("summarization", model=args.model, device=-1)
+
+    for batch_size in args.batch_sizes:
+        engine = ChunkedSummarizer(summarizer, batch_size=batch_size)
+        chunks = engine.split_text(text)
+
+        start = time.perf_counter()
+        engine.summarize(text, args.max_length)
+        elapsed = time.perf_counter() - start
+
+        print(f"batch size {batch_size:>2}: {pages:.1f} pages, {len(chunks)} chunks, "
+              f"{elapsed:.1f}s, {pages / elapsed:.2f} pages/s")
+
+
+if __name__ == '__main__':
+    main()
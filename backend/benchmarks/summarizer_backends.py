@@ -0,0 +1,131 @@
+''' Compares the CPU inference backends of the
+summarizer: load time, latency, memory, and the
+ROUGE agreement of their summaries with the ones
+of the float32 pytorch pipeline.
+
+Run from the backend directory:
+    python -m benchmarks.summarizer_backends --docs 10 [--backends pytorch int8 onnx]
+'''
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.glove_registry import current_rss_mb, peak_rss_mb
+from benchmarks.sample_text import synthetic_document
+
+MODEL_NAME = "facebook/bart-large-cnn"
+
+
+def run_backend(backend, num_docs, sentences, max_length):
+    ''' Loads the summarizer with the backend and
+    summarizes the documents, returns the timings,
+    the memory usage and the summaries
+    '''
+    from summarizer_backends import load_summarizer
+
+    start = time.perf_counter()
+    summarizer = load_summarizer(MODEL_NAME, backend)
+    load_time = time.perf_counter() - start
+
+    summaries = []
+    timings = []
+    for seed in range(num_docs):
+        text = synthetic_document(sentences, seed=seed)
+        start = time.perf_counter()
+        summaries.append(summarizer(
+            text, max_length=max_length, min_length=max_length // 2, do_sample=False, truncation=True,
+        )[0]['summary_text'])
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_time, 2),
+        "median_latency_s": round(statistics.median(timings), 3),
+        "rss_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "summaries": summaries,
+    }
+
+
+def ngrams(tokens, n):
+    return [tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+def f1(overlap, candidate_total, reference_total):
+    if not overlap:
+        return 0.0
+    precision = overlap / candidate_total
+    recall = overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate, reference, n):
+    candidate_ngrams = ngrams(candidate.lower().split(), n)
+    reference_ngrams = ngrams(reference.lower().split(), n)
+    remaining = list(reference_ngrams)
+    overlap = 0
+    for gram in candidate_ngrams:
+        if gram in remaining:
+            remaining.remove(gram)
+            overlap += 1
+    return f1(overlap, len(candidate_ngrams), len(reference_ngrams))
+
+
+def rouge_l(candidate, reference):
+    candidate_tokens = candidate.lower().split()
+    reference_tokens = reference.lower().split()
+    # length of the longest common subsequence, one row at a time
+    previous = [0] * (len(reference_tokens) + 1)
+    for candidate_token in candidate_tokens:
+        current = [0]
+        for j, reference_token in enumerate(reference_tokens):
+            current.append(previous[j] + 1 if candidate_token == reference_token else max(previous[j + 1], current[j]))
+        previous = current
+    return f1(previous[-1], len(candidate_tokens), len(reference_tokens))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--sentences", type=int, default=30, help="sentences per document")
+    parser.add_argument("--max-length", type=int, default=130)
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "int8", "onnx"])
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.docs, args.sentences, args.max_length)))
+        return
+
+    # the float32 pipeline is the reference of the ROUGE scores
+    backends = ["pytorch"] + [backend for backend in args.backends if backend != "pytorch"]
+
+    # every backend runs in a fresh interpreter so the memory numbers are not mixed
+    reference = None
+    for backend in backends:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.summarizer_backends", "--backend", backend,
+             "--docs", str(args.docs), "--sentences", str(args.sentences), "--max-length", str(args.max_length)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if reference is None:
+            reference = result["summaries"]
+
+        pairs = list(zip(result["summaries"], reference))
+        scores = {
+            "rouge1": statistics.mean(rouge_n(candidate, ref, 1) for candidate, ref in pairs),
+            "rouge2": statistics.mean(rouge_n(candidate, ref, 2) for candidate, ref in pairs),
+            "rougeL": statistics.mean(rouge_l(candidate, ref) for candidate, ref in pairs),
+        }
+        print(f"{result['backend']:>8}: load {result['load_s']}s, "
+              f"median latency {result['median_latency_s']}s, "
+              f"rss {result['rss_mb']} MB (peak {result['peak_rss_mb']} MB), "
+              f"rouge-1/2/L vs pytorch {scores['rouge1']:.3f}/{scores['rouge2']:.3f}/{scores['rougeL']:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+''' Measures how set_tfidf_scores scales with the
+document size, comparing the old dense nested-loop
+implementation with the sparse column reductions,
+and checks that both give the same scores.
+
+Run from the backend directory:
+    python -m benchmarks.tfidf_scaling --sizes 100 1000 5000
+'''
+import argparse
+import time
+
+from benchmarks.sample_text import synthetic_document
+from question_extraction import QuestionExtractor
+
+
+def dense_tfidf_scores(extractor, document):
+    ''' The previous implementation, kept here as reference '''
+    from nltk.tokenize import sent_tokenize
+
+    unfiltered_sentences = sent_tokenize(document)
+    filtered_sentences = extractor.get_filtered_sentences(document)
+    word_score = dict()
+    sentence_for_max_word_score = dict()
+
+    tf_idf_vector = extractor.vectorizer.fit_transform(filtered_sentences)
+    feature_names = extractor.vectorizer.get_feature_names_out()
+    tf_idf_matrix = tf_idf_vector.todense().tolist()
+
+    num_sentences = len(unfiltered_sentences)
+    for i in range(len(feature_names)):
+        word = feature_names[i]
+        sentence_for_max_word_score[word] = ""
+        tot = 0.0
+        cur_max = 0.0
+        for j in range(num_sentences):
+            tot += tf_idf_matrix[j][i]
+            if tf_idf_matrix[j][i] > cur_max:
+                cur_max = tf_idf_matrix[j][i]
+                sentence_for_max_word_score[word] = unfiltered_sentences[j]
+        word_score[word] = tot / num_sentences
+    return word_score, sentence_for_max_word_score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="document sizes in sentences")
+    parser.add_argument("--skip-dense-above", type=int, default=5000,
+                        help="do not run the dense version above this many sentences")
+    args = parser.parse_args()
+
+    extractor = QuestionExtractor(num_questions=10)
+    print(f"{'sentences':>10} {'sparse (s)':>12} {'dense (s)':>12} {'same output':>12}")
+    for size in args.sizes:
+        document = synthetic_document(size, seed=size)
+
+        start = time.perf_counter()
+        extractor.set_tfidf_scores(document)
+        sparse_time = time.perf_counter() - start
+
+        if size > args.skip_dense_above:
+            print(f"{size:>10} {sparse_time:>12.3f} {'-':>12} {'-':>12}")
+            continue
+
+        start = time.perf_counter()
+        word_score, sentence_for_max_word_score = dense_tfidf_scores(extractor, document)
+        dense_time = time.perf_counter() - start
+
+        same = (
+            sentence_for_max_word_score == extractor.sentence_for_max_word_score
+            and word_score.keys() == extractor.word_score.keys()
+            and all(abs(word_score[w] - extractor.word_score[w]) < 1e-9 for w in word_score)
+        )
+        print(f"{size:>10} {sparse_time:>12.3f} {dense_time:>12.3f} {str(same):>12}")
+
+
+if __name__ == '__main__':
+    main()
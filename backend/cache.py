@@ -0,0 +1,183 @@
+''' This module contains the bounded, thread-safe
+LRU cache used to keep results across requests,
+with an optional persistent layer on disk
+'''
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    ''' An in-memory LRU cache bounded both by its
+    number of entries and by the estimated size of
+    its values. When a path is given, every entry is
+    also stored in a sqlite file, which is read on
+    memory misses and survives restarts. Entries
+    older than the ttl, if any, are never returned
+    '''
+
+    def __init__(self, max_entries=1000, max_bytes=None, path=None, max_disk_entries=None, ttl=None):
+        '''
+        Params:
+            * max_entries : int, max number of entries kept in memory
+            * max_bytes : int, max estimated size of the entries kept in memory
+            * path : str, sqlite file of the persistent layer, None to disable it
+            * max_disk_entries : int, max number of entries kept on disk
+            * ttl : float, seconds after which an entry expires, None to keep them
+        '''
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+
+        self.entries = OrderedDict()  # key -> (value, size, created_at)
+        self.num_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.lock = threading.Lock()
+
+        # the sqlite connection is opened on first use, by the process using it
+        self.path = path
+        self.db = None
+        self.db_pid = None
+
+    def get_db(self):
+        ''' Returns the sqlite connection of the current
+        process, None without a persistent layer. A
+        connection is never shared with a forked child,
+        e.g. a gunicorn worker of a preloaded app, the
+        child opens its own. Call it with the lock held
+        '''
+        if not self.path:
+            return None
+        if self.db is not None and self.db_pid == os.getpid():
+            return self.db
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value BLOB, accessed_at INTEGER, created_at REAL)")
+        columns = {row[1] for row in db.execute("PRAGMA table_info(cache)")}
+        if "created_at" not in columns:
+            # file created before entries could expire
+            db.execute("ALTER TABLE cache ADD COLUMN created_at REAL")
+        db.commit()
+        self.disk_clock = db.execute("SELECT COALESCE(MAX(accessed_at), 0) FROM cache").fetchone()[0]
+
+        self.db = db
+        self.db_pid = os.getpid()
+        return db
+
+    def get(self, key, default=None):
+        ''' Returns the value stored for key, or
+        default if there is none
+        '''
+        with self.lock:
+            if key in self.entries:
+                value, size, created_at = self.entries[key]
+                if not self.is_expired(created_at):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.num_bytes -= size
+                self.expirations += 1
+
+            db = self.get_db()
+            if db is not None:
+                row = db.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.is_expired(row[1]):
+                    db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    db.commit()
+                    self.expirations += 1
+                elif row is not None:
+                    self.touch_disk_entry(db, key)
+                    db.commit()
+                    self.disk_hits += 1
+                    value = pickle.loads(row[0])
+                    self.set_memory_entry(key, value, len(row[0]), row[1])
+                    return value
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        ''' Stores the value for key, evicting the
+        least recently used entries if needed
+        '''
+        data = pickle.dumps(value)
+        created_at = time.time()
+        with self.lock:
+            self.set_memory_entry(key, value, len(data), created_at)
+
+            db = self.get_db()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, data, created_at))
+                if self.ttl is not None:
+                    db.execute("DELETE FROM cache WHERE created_at < ?", (created_at - self.ttl,))
+                self.touch_disk_entry(db, key)
+                if self.max_disk_entries is not None:
+                    db.execute(
+                        "DELETE FROM cache WHERE key NOT IN "
+                        "(SELECT key FROM cache ORDER BY accessed_at DESC LIMIT ?)",
+                        (self.max_disk_entries,))
+                db.commit()
+
+    def is_expired(self, created_at):
+        if self.ttl is None:
+            return False
+        return created_at is None or time.time() - created_at > self.ttl
+
+    def set_memory_entry(self, key, value, size, created_at):
+        ''' Stores the entry in memory and evicts
+        until both bounds are respected. Call it
+        with the lock held
+        '''
+        if key in self.entries:
+            self.num_bytes -= self.entries.pop(key)[1]
+
+        size += len(key)
+        self.entries[key] = (value, size, created_at)
+        self.num_bytes += size
+
+        while self.entries and (
+                len(self.entries) > self.max_entries
+                or (self.max_bytes is not None and self.num_bytes > self.max_bytes)):
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.num_bytes -= evicted_size
+            self.evictions += 1
+
+    def touch_disk_entry(self, db, key):
+        ''' Marks the disk entry as the most recently
+        used one. Call it with the lock held
+        '''
+        self.disk_clock += 1
+        db.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (self.disk_clock, key))
+
+    def stats(self):
+        ''' Returns the counters of the cache,
+        for monitoring
+        '''
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.num_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
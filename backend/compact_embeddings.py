@@ -0,0 +1,136 @@
+''' This module contains the compact embedding
+store: float16 vectors with precomputed norms,
+of which only the most frequent words are searched.
+
+Build it once, offline, from the backend directory:
+    python -m compact_embeddings [--max-words 200000]
+'''
+import argparse
+import os
+
+import numpy as np
+
+# rows scored at once by a search, bounds the float32 temporaries
+SEARCH_CHUNK_SIZE = 65536
+
+
+class CompactKeyedVectors:
+    ''' A read-only stand-in for gensim's KeyedVectors,
+    with the vectors stored as float16 and memory-mapped.
+    Every word can be looked up, but only the first
+    num_searchable (most frequent) words are scanned by
+    the similarity searches, so only their rows and the
+    rows of the words actually looked up for the current
+    document become resident
+    '''
+
+    def __init__(self, index_to_key, vectors, norms, num_searchable=None):
+        '''
+        Params:
+            * index_to_key : list<str>, the words, most frequent first
+            * vectors : (words x dim) float16 array
+            * norms : (words) float32 array, norms of the float16 vectors
+            * num_searchable : int, number of words scanned by the searches
+        '''
+        self.index_to_key = index_to_key
+        self.key_to_index = {word: i for i, word in enumerate(index_to_key)}
+        self.vectors = vectors
+        self.norms = norms
+        self.vector_size = vectors.shape[1]
+        self.num_searchable = min(num_searchable or len(index_to_key), len(index_to_key))
+
+    @classmethod
+    def from_keyed_vectors(cls, model, max_words=None):
+        ''' Converts a gensim KeyedVectors, keeping
+        its first max_words words
+        '''
+        max_words = min(max_words or len(model.index_to_key), len(model.index_to_key))
+        vectors = np.asarray(model.vectors[:max_words], dtype=np.float16)
+        norms = np.linalg.norm(vectors.astype(np.float32), axis=1)
+        return cls(list(model.index_to_key[:max_words]), vectors, norms)
+
+    @classmethod
+    def searchable_words_for_budget(cls, memory_budget_mb, vector_size):
+        ''' Returns how many words can be searched
+        within the memory budget
+        '''
+        # a float16 vector and a float32 norm per word
+        return int(memory_budget_mb * 2 ** 20) // (vector_size * 2 + 4)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "norms.npy"), self.norms)
+        with open(os.path.join(path, "vocab.txt"), 'w', encoding="utf-8") as vocab_file:
+            vocab_file.write("\n".join(self.index_to_key))
+
+    @classmethod
+    def load(cls, path, memory_budget_mb=None):
+        ''' Loads a saved store with its vectors
+        memory-mapped read-only. The memory budget
+        sets the number of searchable words
+        '''
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode='r')
+        norms = np.load(os.path.join(path, "norms.npy"))
+        with open(os.path.join(path, "vocab.txt"), encoding="utf-8") as vocab_file:
+            index_to_key = vocab_file.read().split("\n")
+
+        num_searchable = None
+        if memory_budget_mb is not None:
+            num_searchable = cls.searchable_words_for_budget(memory_budget_mb, vectors.shape[1])
+        return cls(index_to_key, vectors, norms, num_searchable)
+
+    def __contains__(self, word):
+        return word in self.key_to_index
+
+    def get_vector(self, word, norm=False):
+        index = self.key_to_index[word]
+        vector = self.vectors[index].astype(np.float32)
+        return vector / self.norms[index] if norm else vector
+
+    def score(self, queries):
+        ''' Returns the (searchable words x queries)
+        cosine similarities with the unit-normalized
+        queries, given as a (dim x queries) array
+        '''
+        scores = np.empty((self.num_searchable, queries.shape[1]), dtype=np.float32)
+        for start in range(0, self.num_searchable, SEARCH_CHUNK_SIZE):
+            end = min(start + SEARCH_CHUNK_SIZE, self.num_searchable)
+            chunk = self.vectors[start:end].astype(np.float32)
+            scores[start:end] = (chunk @ queries) / self.norms[start:end, np.newaxis]
+        return scores
+
+    def similarity(self, word_1, word_2):
+        return float(self.get_vector(word_1, norm=True) @ self.get_vector(word_2, norm=True))
+
+    def similar_by_word(self, word, topn=10):
+        ''' Returns the topn (word, similarity) pairs
+        most similar to word among the searchable
+        words, like KeyedVectors.similar_by_word
+        '''
+        index = self.key_to_index[word]
+        scores = self.score(self.get_vector(word, norm=True)[:, np.newaxis])[:, 0]
+        if index < len(scores):
+            scores[index] = -np.inf  # a word is not its own neighbour
+
+        topn = min(topn, len(scores) - 1)
+        top = np.argpartition(-scores, topn)[:topn]
+        top = top[np.argsort(-scores[top])]
+        return [(self.index_to_key[i], float(scores[i])) for i in top]
+
+
+def main():
+    from model_registry import get_compact_path, get_full_glove_model
+
+    parser = argparse.ArgumentParser(description="Builds the compact float16 store of the GloVe model")
+    parser.add_argument("--max-words", type=int, default=None,
+                        help="number of most frequent words to keep, all by default")
+    args = parser.parse_args()
+
+    store = CompactKeyedVectors.from_keyed_vectors(get_full_glove_model(), args.max_words)
+    store.save(get_compact_path())
+    print(f"saved {len(store.index_to_key)} float16 vectors to {get_compact_path()}")
+
+
+if __name__ == '__main__':
+    main()
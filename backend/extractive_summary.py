@@ -0,0 +1,88 @@
+''' This module contains the extractive summarizer:
+the sentences of the text are ranked with LexRank,
+a PageRank over their tf-idf cosine similarities,
+and the best ones are kept in their original order
+'''
+import numpy as np
+from nltk.tokenize import sent_tokenize
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# identifies the summaries of this engine, e.g. in cache keys
+EXTRACTIVE_MODEL_NAME = "lexrank-tfidf"
+
+
+class LexRankSummarizer:
+    ''' Summarizes a text by extracting its most
+    central sentences, without any neural model
+    '''
+
+    def __init__(self, damping=0.85, similarity_threshold=0.1, max_iterations=100, tolerance=1e-6):
+        '''
+        Params:
+            * damping : float, probability of following a similarity rather than jumping
+            * similarity_threshold : float, smaller similarities are not edges of the graph
+            * max_iterations : int, max power iterations
+            * tolerance : float, L1 change of the scores at which the iterations stop
+        '''
+        self.damping = damping
+        self.similarity_threshold = similarity_threshold
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+    def rank_sentences(self, sentences):
+        ''' Returns the LexRank score of every sentence
+        Params:
+            * sentences : list<str>
+        Returns:
+            * (sentences) float array, summing to 1
+        '''
+        num_sentences = len(sentences)
+        try:
+            # rows are l2-normalized, so their products are cosine similarities
+            tf_idf_matrix = TfidfVectorizer(stop_words='english').fit_transform(sentences)
+        except ValueError:
+            # nothing but stopwords, every sentence is as central
+            return np.full(num_sentences, 1.0 / num_sentences)
+
+        similarities = (tf_idf_matrix @ tf_idf_matrix.T).tocsr()
+        similarities.setdiag(0)
+        similarities.data[similarities.data < self.similarity_threshold] = 0
+        similarities.eliminate_zeros()
+
+        # row-stochastic transitions, sentences without any edge jump uniformly
+        degrees = np.asarray(similarities.sum(axis=1)).ravel()
+        dangling = degrees == 0
+        inverse_degrees = np.divide(1.0, degrees, out=np.zeros_like(degrees), where=~dangling)
+        transitions_t = similarities.T.multiply(inverse_degrees).tocsr()
+
+        scores = np.full(num_sentences, 1.0 / num_sentences)
+        for _ in range(self.max_iterations):
+            new_scores = transitions_t @ scores + scores[dangling].sum() / num_sentences
+            new_scores = (1 - self.damping) / num_sentences + self.damping * new_scores
+            converged = np.abs(new_scores - scores).sum() < self.tolerance
+            scores = new_scores
+            if converged:
+                break
+        return scores
+
+    def summarize(self, text, max_length):
+        ''' Returns the most central sentences of the
+        text, in their original order, up to about
+        max_length words (always at least one sentence)
+        '''
+        sentences = [sentence for sentence in sent_tokenize(text) if sentence.strip()]
+        if len(sentences) <= 1:
+            return " ".join(sentences)
+
+        scores = self.rank_sentences(sentences)
+
+        kept = []
+        num_words = 0
+        for i in np.argsort(-scores, kind='stable'):
+            sentence_words = len(sentences[i].split())
+            if kept and num_words + sentence_words > max_length:
+                continue
+            kept.append(i)
+            num_words += sentence_words
+
+        return " ".join(sentences[i] for i in sorted(kept))
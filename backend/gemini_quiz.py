@@ -0,0 +1,464 @@
+''' This module contains the quiz generation
+with Gemini used by the quiz routes
+'''
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from nltk.tokenize import sent_tokenize
+
+from sentence_chunks import chunk_sentences
+
+# bump when QUIZ_PROMPT changes so that older cached quizzes are not reused
+PROMPT_VERSION = 2
+
+# rough number of characters per token, to size the chunks without a tokenizer call
+CHARS_PER_TOKEN = 4
+
+# requests for the invalid or missing questions of a response, before giving up on them
+MAX_REPAIR_ATTEMPTS = 2
+
+# ask Gemini for JSON instead of free text
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+QUESTION_SCHEMA = """
+{{
+    "questions": [
+        {{
+            "question": "...",
+            "answer": "...",
+            "options": ["...", "...", "...", "..."]
+        }},
+        ...
+    ]
+}}
+
+Every question has exactly {num_options} distinct options, and its answer is one of them.
+"""
+
+QUIZ_PROMPT = """
+Generate exactly {num_questions} multiple-choice questions (MCQs) from the text below.
+Return only JSON, no code fences, no explanation, in the following format:
+""" + QUESTION_SCHEMA + """
+Text:
+{text}
+"""
+
+REPAIR_PROMPT = """
+These multiple-choice questions generated from the text below are invalid:
+{invalid}
+
+Generate exactly {num_questions} valid multiple-choice questions from the text to replace them,
+fixing the invalid ones where possible. They must differ from these questions:
+{existing}
+
+Return only JSON, no code fences, no explanation, in the following format:
+""" + QUESTION_SCHEMA + """
+Text:
+{text}
+"""
+
+
+class QuizGenerationError(Exception):
+    ''' Raised when Gemini's response cannot be
+    turned into a quiz, the message is meant to
+    be shown to the user
+    '''
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_text(text, token_budget):
+    ''' Splits the text into chunks of at most
+    token_budget (estimated) tokens, on page
+    boundaries (form feeds) and sentence boundaries,
+    empty if the text has no sentence
+    '''
+    sentences = [sentence for page in text.split('\f') for sentence in sent_tokenize(page)]
+    return chunk_sentences(sentences, token_budget * CHARS_PER_TOKEN)
+
+
+def split_quota(total, weights):
+    ''' Splits total into integer parts proportional
+    to the weights (largest remainder method)
+    '''
+    weight_sum = sum(weights)
+    exact = [total * weight / weight_sum for weight in weights]
+    quotas = [int(value) for value in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - quotas[i], reverse=True)
+    for i in by_remainder[:total - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
+
+
+def normalize_question(question):
+    return re.sub(r'[^a-z0-9]+', ' ', str(question).lower()).strip()
+
+
+def get_question_errors(question, num_options):
+    ''' Returns the list of the reasons why the
+    question does not match the schema, empty if
+    it is valid
+    '''
+    if not isinstance(question, dict):
+        return ["it is not an object"]
+
+    errors = []
+    for field in ("question", "answer"):
+        if not isinstance(question.get(field), str) or not question[field].strip():
+            errors.append(f'"{field}" must be a non-empty string')
+
+    options = question.get("options")
+    if not isinstance(options, list) or not all(isinstance(option, str) and option.strip() for option in options):
+        errors.append('"options" must be a list of non-empty strings')
+    elif len(options) != num_options or len(set(options)) != num_options:
+        errors.append(f'"options" must hold {num_options} distinct options')
+    elif question.get("answer") not in options:
+        errors.append('"answer" must be one of the options')
+    return errors
+
+
+def question_number_key(number):
+    ''' Sort key of the numbers of a {number: question}
+    dict: numbers in numeric order (1, 2, 10), then
+    any other key
+    '''
+    number = str(number).strip()
+    return (0, int(number), "") if number.isdigit() else (1, 0, number)
+
+
+def get_response_questions(data):
+    ''' Returns the list of questions of a parsed
+    response: {"questions": [...]}, a bare list, or
+    the older {number: question} dict
+    '''
+    if isinstance(data, dict) and isinstance(data.get("questions"), list):
+        return data["questions"]
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        return [data[number] for number in sorted(data, key=question_number_key)]
+    return []
+
+
+def parse_json(content):
+    ''' Returns the JSON value of Gemini's response,
+    raises QuizGenerationError if there is none
+    '''
+    if not content:
+        raise QuizGenerationError('Gemini returned an empty response.')
+
+    # Remove markdown code fences (```json or ```) in case the model added some
+    content_clean = re.sub(r'^```[a-zA-Z]*|```$', '', content.strip()).strip()
+    try:
+        return json.loads(content_clean)
+    except ValueError as parse_err:
+        raise QuizGenerationError(f'Failed to parse JSON from Gemini response: {parse_err}')
+
+
+class QuestionStreamParser:
+    ''' Incrementally parses the JSON of a streamed
+    response: every question object is returned as
+    soon as its closing brace arrives
+    '''
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_starts = []
+
+    def feed(self, text):
+        ''' Adds the text to the buffer and returns
+        the list of question objects completed by it
+        '''
+        self.buffer += text
+        questions = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.object_starts.append(self.position)
+            elif char == '}' and self.object_starts:
+                start = self.object_starts.pop()
+                try:
+                    value = json.loads(self.buffer[start:self.position + 1])
+                except ValueError:
+                    value = None  # left to the parsing of the whole response
+                if isinstance(value, dict) and "question" in value:
+                    questions.append(value)
+            self.position += 1
+        return questions
+
+
+class GeminiQuizGenerator:
+    ''' This class contains the methods to
+    generate a quiz from a text with Gemini,
+    reusing the quizzes already generated for
+    the same text. Texts longer than the chunk
+    token budget are split into chunks which are
+    quizzed concurrently and merged. Every question
+    is validated, and only the invalid or missing
+    ones are requested again
+    '''
+
+    def __init__(self, model, model_name, cache=None, num_questions=10, num_options=4,
+                 chunk_token_budget=None, max_concurrency=4, single_flight=None, compressor=None):
+        '''
+        Params:
+            * model : genai.GenerativeModel
+            * model_name : str, name of the model, part of the cache key
+            * cache : LRUCache of the generated quizzes, None to disable it
+            * num_questions : int
+            * num_options : int, options per question
+            * chunk_token_budget : int, max tokens of text per request, None to never split
+            * max_concurrency : int, max requests sent at once for the chunks of a text
+            * single_flight : SingleFlight shared by the identical requests, None to disable it
+            * compressor : SalienceCompressor shortening the texts before the prompt, None to send them whole
+        '''
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+        self.num_questions = num_questions
+        self.num_options = num_options
+        self.chunk_token_budget = chunk_token_budget
+        self.max_concurrency = max_concurrency
+        self.single_flight = single_flight
+        self.compressor = compressor
+
+    def get_cache_key(self, text):
+        ''' Returns the key of a quiz: a hash of the
+        text, the prompt version and the model name
+        '''
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        compression = self.compressor.cache_id if self.compressor is not None else "full"
+        return f"{self.model_name}:{PROMPT_VERSION}:{self.num_questions}:{self.num_options}:{compression}:{digest}"
+
+    def compress_text(self, text):
+        ''' Returns the text sent in the prompt '''
+        return self.compressor.compress(text) if self.compressor is not None else text
+
+    def needs_chunks(self, text):
+        return self.chunk_token_budget is not None and estimate_tokens(text) > self.chunk_token_budget
+
+    def generate_questions(self, text):
+        ''' Returns the questions dict in the format:
+        question_number: {
+            question: str
+            answer: str
+            options: list<str>
+        }
+        Raises QuizGenerationError if Gemini did not
+        return any valid question
+        '''
+        questions = self.get_cached_questions(text)
+        if questions is not None:
+            return questions
+        return self.generate_new_questions(text)
+
+    def get_cached_questions(self, text):
+        ''' Returns the cached quiz of the text,
+        None if there is none
+        '''
+        if self.cache is None:
+            return None
+        return self.cache.get(self.get_cache_key(text))
+
+    def generate_new_questions(self, text):
+        ''' Generates the quiz of the text without
+        looking it up in the cache first
+        '''
+        key = self.get_cache_key(text)
+
+        def generate():
+            return self.generate_uncached_questions(self.compress_text(text), key)
+
+        if self.single_flight is not None:
+            # concurrent requests for the same quiz wait for a single generation
+            return self.single_flight.do(key, generate)
+        return generate()
+
+    def generate_uncached_questions(self, text, key):
+        ''' Generates the quiz of the text and
+        caches it under key
+        '''
+        if self.needs_chunks(text):
+            question_list = self.generate_chunked_questions(text)
+        else:
+            question_list = self.request_questions(text, self.num_questions)
+        questions = {number: question for number, question in enumerate(question_list, start=1)}
+
+        if self.cache is not None and questions:
+            self.cache.set(key, questions)
+        return questions
+
+    def stream_questions(self, text):
+        ''' Yields the (question_number, question) pairs
+        of the quiz as soon as each of them has been
+        generated and validated, numbered from 1 in
+        arrival order. Texts that are split into chunks
+        are generated whole, then yielded
+        '''
+        key = self.get_cache_key(text)
+        questions = self.cache.get(key) if self.cache is not None else None
+        if questions is None:
+            text = self.compress_text(text)
+            if self.needs_chunks(text):
+                questions = self.generate_uncached_questions(text, key)
+        if questions is not None:
+            yield from questions.items()
+            return
+
+        prompt = QUIZ_PROMPT.format(num_questions=self.num_questions, num_options=self.num_options, text=text)
+        parser = QuestionStreamParser()
+        valid, invalid = [], []
+        for chunk in self.model.generate_content(prompt, stream=True, generation_config=JSON_GENERATION_CONFIG):
+            for question in parser.feed(chunk.text):
+                if self.add_question(question, valid, invalid, self.num_questions):
+                    yield len(valid), valid[-1]
+
+        if not valid and not invalid:
+            # raises the same errors as the non-streamed routes
+            for question in get_response_questions(parse_json(parser.buffer)):
+                self.add_question(question, valid, invalid, self.num_questions)
+            yield from enumerate(valid, start=1)
+
+        num_streamed = len(valid)
+        valid = self.repair_questions(text, valid, invalid, self.num_questions)
+        yield from enumerate(valid[num_streamed:], start=num_streamed + 1)
+
+        questions = {number: question for number, question in enumerate(valid, start=1)}
+        if self.cache is not None and questions:
+            self.cache.set(key, questions)
+
+    def generate_chunked_questions(self, text):
+        ''' Splits the text into chunks, requests a
+        share of the questions for each of them
+        concurrently, then merges and dedupes the
+        questions
+        '''
+        chunks = split_text(text, self.chunk_token_budget)
+        if not chunks:
+            raise QuizGenerationError('The text does not contain any sentence to generate questions from.')
+        quotas = split_quota(self.num_questions, [len(chunk) for chunk in chunks])
+
+        # one spare question per chunk to make up for the duplicates
+        requests = [(chunk, quota + 1) for chunk, quota in zip(chunks, quotas) if quota > 0]
+
+        def request(chunk_and_quota):
+            try:
+                return self.request_questions(*chunk_and_quota)
+            except QuizGenerationError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            results = list(executor.map(request, requests))
+
+        all_questions = [
+            (quota - 1, result) for (_, quota), result in zip(requests, results)
+            if not isinstance(result, QuizGenerationError)
+        ]
+        if not all_questions:
+            raise next(result for result in results if isinstance(result, QuizGenerationError))
+
+        # every chunk first contributes its own share, then its spares
+        merged = []
+        seen = set()
+        for take_spares in (False, True):
+            for quota, chunk_questions in all_questions:
+                for question in (chunk_questions[quota:] if take_spares else chunk_questions[:quota]):
+                    normalized = normalize_question(question["question"])
+                    if normalized not in seen:
+                        seen.add(normalized)
+                        merged.append(question)
+
+        return merged[:self.num_questions]
+
+    def request_questions(self, text, num_questions):
+        ''' Asks Gemini for num_questions questions
+        about the text and returns the list of the
+        valid ones, after repairing the others
+        '''
+        prompt = QUIZ_PROMPT.format(num_questions=num_questions, num_options=self.num_options, text=text)
+        valid, invalid = self.parse_response(self.request_content(prompt), num_questions)
+        return self.repair_questions(text, valid, invalid, num_questions)
+
+    def request_content(self, prompt):
+        # Generate MCQs using Gemini
+        response = self.model.generate_content(prompt, generation_config=JSON_GENERATION_CONFIG)
+        return response.text.strip()
+
+    def parse_response(self, content, num_questions):
+        ''' Returns the valid questions of Gemini's
+        response, and the (question, errors) pairs of
+        the invalid ones. Raises QuizGenerationError
+        if the response is not JSON
+        '''
+        valid, invalid = [], []
+        for question in get_response_questions(parse_json(content)):
+            self.add_question(question, valid, invalid, num_questions)
+        return valid, invalid
+
+    def add_question(self, question, valid, invalid, num_questions):
+        ''' Appends the question to valid if it
+        matches the schema and is not a duplicate,
+        else to invalid. Returns whether it is valid
+        '''
+        if len(valid) >= num_questions:
+            return False
+
+        errors = get_question_errors(question, self.num_options)
+        if not errors and normalize_question(question["question"]) in {
+                normalize_question(other["question"]) for other in valid}:
+            errors = ["it repeats another question"]
+        if errors:
+            invalid.append((question, errors))
+            return False
+
+        valid.append({"question": question["question"], "answer": question["answer"], "options": question["options"]})
+        return True
+
+    def repair_questions(self, text, valid, invalid, num_questions):
+        ''' Requests only the invalid or missing
+        questions again until there are num_questions
+        valid ones, or MAX_REPAIR_ATTEMPTS requests
+        have been made. Raises QuizGenerationError if
+        there is still no valid question
+        '''
+        valid = list(valid)
+        for _ in range(MAX_REPAIR_ATTEMPTS):
+            missing = num_questions - len(valid)
+            if missing <= 0:
+                break
+
+            prompt = REPAIR_PROMPT.format(
+                num_questions=missing,
+                num_options=self.num_options,
+                invalid=json.dumps([
+                    {"question": question, "errors": errors} for question, errors in invalid
+                ], indent=1) if invalid else "(missing questions)",
+                existing=json.dumps([question["question"] for question in valid], indent=1),
+                text=text,
+            )
+            try:
+                repaired, invalid = self.parse_response(self.request_content(prompt), missing)
+            except QuizGenerationError:
+                continue
+            for question in repaired:
+                self.add_question(question, valid, invalid, num_questions)
+
+        if not valid:
+            raise QuizGenerationError('Gemini did not return any valid question.')
+        return valid
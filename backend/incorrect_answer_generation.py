@@ -2,12 +2,37 @@
 for generating incorrect alternative
 answers for a given answer
 '''
-import gensim
-import gensim.downloader as api
-from gensim.models import Word2Vec
-from nltk.tokenize import sent_tokenize, word_tokenize
+from nltk.corpus import stopwords
+from nltk.tokenize import sent_tokenize
+import os
 import random
+import threading
 import numpy as np
+from cache import LRUCache
+from model_registry import get_ann_index, get_glove_model, get_glove_model_id, get_neighbour_table
+from parsed_document import ParsedDocument
+
+_distractor_cache = None
+_distractor_cache_lock = threading.Lock()
+
+
+def get_distractor_cache():
+    ''' Returns the answer -> similar words cache
+    shared by all the generators of the process.
+    It is configured by the DISTRACTOR_CACHE_SIZE
+    (entries), DISTRACTOR_CACHE_MB and, for the
+    optional disk layer, DISTRACTOR_CACHE_PATH
+    env variables
+    '''
+    global _distractor_cache
+    with _distractor_cache_lock:
+        if _distractor_cache is None:
+            _distractor_cache = LRUCache(
+                max_entries=int(os.getenv('DISTRACTOR_CACHE_SIZE', 10000)),
+                max_bytes=int(float(os.getenv('DISTRACTOR_CACHE_MB', 32)) * 2 ** 20),
+                path=os.getenv('DISTRACTOR_CACHE_PATH'),
+            )
+    return _distractor_cache
 
 
 class IncorrectAnswerGenerator:
@@ -17,45 +42,212 @@ class IncorrectAnswerGenerator:
     '''
 
     def __init__(self, document):
-        # model required to fetch similar words
-        self.model = api.load("glove-wiki-gigaword-100")
-        self.all_words = []
-        for sent in sent_tokenize(document):
-            self.all_words.extend(word_tokenize(sent))
-        self.all_words = list(set(self.all_words))
-
-    def get_all_options_dict(self, answer, num_options):
-        ''' This method returns a dict
-        of 'num_options' options out of
-        which one is correct and is the answer
-        '''
-        options_dict = dict()
-        try:
-            similar_words = self.model.similar_by_word(answer, topn=15)[::-1]
-
-            for i in range(1, num_options + 1):
-                options_dict[i] = similar_words[i - 1][0]
-
-        except BaseException:
-            self.all_sim = []
-            for word in self.all_words:
-                if word not in answer:
-                    try:
-                        self.all_sim.append(
-                            (self.model.similarity(answer, word), word))
-                    except BaseException:
-                        self.all_sim.append(
-                            (0.0, word))
-                else:
-                    self.all_sim.append((-1.0, word))
-
-            self.all_sim.sort(reverse=True)
-
-            for i in range(1, num_options + 1):
-                options_dict[i] = self.all_sim[i - 1][1]
-
-        replacement_idx = random.randint(1, num_options)
-
-        options_dict[replacement_idx] = answer
-
-        return options_dict
\ No newline at end of file
+        '''
+        Params:
+            * document : string or ParsedDocument
+        '''
+        # model required to fetch similar words, shared across the process
+        self.model = get_glove_model()
+
+        # the store and its searched words, the neighbours of the answers depend on them
+        self.model_id = get_glove_model_id(self.model)
+
+        # optional precomputed neighbours and index for the neighbour
+        # queries, None if not built
+        self.neighbour_table = get_neighbour_table()
+        self.ann_index = get_ann_index()
+
+        # answer -> similar words, shared across requests
+        self.cache = get_distractor_cache()
+
+        # words never offered as distractors
+        self.stop_words = set(stopwords.words('english'))
+
+        if not isinstance(document, ParsedDocument):
+            document = ParsedDocument(sent_tokenize(document))
+        self.all_words = list(document.vocabulary)
+        self.set_vocabulary_matrix()
+
+    def set_vocabulary_matrix(self):
+        ''' Stacks the normalized vectors of the
+        document vocabulary into one matrix, with
+        a zero row for every word the model lacks
+        '''
+        key_to_index = self.model.key_to_index
+        indices = np.array(
+            [key_to_index.get(word.lower(), -1) for word in self.all_words], dtype=np.int64)
+
+        # True for every word without a vector
+        self.oov_mask = indices < 0
+
+        in_vocab = indices[~self.oov_mask]
+        self.vocabulary_matrix = np.zeros((len(self.all_words), self.model.vector_size), dtype=np.float32)
+        self.vocabulary_matrix[~self.oov_mask] = (
+            self.model.vectors[in_vocab] / self.model.norms[in_vocab, np.newaxis])
+
+    def get_answer_vector(self, answer):
+        ''' Returns the normalized mean vector of
+        the words of the answer known to the model,
+        None if the model knows none of them
+        '''
+        key_to_index = self.model.key_to_index
+        indices = [key_to_index[word] for word in answer.lower().split() if word in key_to_index]
+        if not indices:
+            return None
+
+        vector = (self.model.vectors[indices] / self.model.norms[indices, np.newaxis]).mean(axis=0)
+        return vector / np.linalg.norm(vector)
+
+    def get_document_similar_words(self, answer, num_words):
+        ''' Returns the 'num_words' words of the
+        document most similar to the answer, using
+        one matrix-vector product over the vocabulary
+        matrix and a partial top-k
+        '''
+        answer_vector = self.get_answer_vector(answer)
+        if answer_vector is None:
+            scores = np.zeros(len(self.all_words), dtype=np.float32)
+        else:
+            # words without a vector have a zero row, so a score of 0.0
+            scores = self.vocabulary_matrix @ answer_vector
+
+        # words which are part of the answer are never picked
+        scores[[word in answer for word in self.all_words]] = -1.0
+
+        num_words = min(num_words, len(scores))
+        if num_words == 0:
+            return []
+
+        # only the words scoring at least the k-th best score are sorted,
+        # ties are broken by the word like a full sort would
+        threshold = np.partition(scores, -num_words)[-num_words]
+        candidates = np.flatnonzero(scores >= threshold)
+        ranked = sorted(((scores[i], self.all_words[i]) for i in candidates), reverse=True)
+
+        return [word for _, word in ranked[:num_words]]
+
+    def get_cache_key(self, answer):
+        return f"{self.model_id}:{answer}"
+
+    def get_vocabulary_scores(self, queries):
+        ''' Returns the (vocabulary x queries) cosine
+        similarities with the unit-normalized queries,
+        given as a (dim x queries) array. A compact
+        store only scores its searchable words
+        '''
+        if hasattr(self.model, "score"):
+            return self.model.score(queries)
+        return (self.model.vectors @ queries) / self.model.norms[:, np.newaxis]
+
+    def get_similar_words_many(self, answers, topn, num_extra=0):
+        ''' Returns, for every answer, the words of the
+        model most similar to it, most similar first,
+        or None if the model lacks the answer, with
+        'num_extra' words past the topn for the answers
+        which are searched. Answers missing from the
+        neighbour table are searched in the ANN index,
+        or together with one matrix-matrix product
+        when no index has been built
+        '''
+        key_to_index = self.model.key_to_index
+        similar_words = [None] * len(answers)
+        to_search = []
+
+        for i, answer in enumerate(answers):
+            if answer not in key_to_index:
+                continue
+            cached_words = self.cache.get(self.get_cache_key(answer))
+            if cached_words is not None and len(cached_words) >= topn:
+                similar_words[i] = cached_words
+                continue
+            if self.neighbour_table is not None:
+                similar_words[i] = self.neighbour_table.most_similar(self.model, answer, topn=topn)
+                if similar_words[i] is not None:
+                    self.cache.set(self.get_cache_key(answer), similar_words[i])
+                    continue
+            if self.ann_index is not None:
+                similar_words[i] = self.ann_index.most_similar(self.model, answer, topn=topn + num_extra)
+                self.cache.set(self.get_cache_key(answer), similar_words[i])
+                continue
+            to_search.append(i)
+
+        if not to_search:
+            return similar_words
+
+        indices = np.array([key_to_index[answers[i]] for i in to_search])
+        queries = self.model.vectors[indices] / self.model.norms[indices, np.newaxis]
+
+        # (vocabulary x answers) cosine similarities
+        scores = self.get_vocabulary_scores(queries.T)
+
+        # an answer is not its own neighbour
+        searchable = indices < len(scores)
+        scores[indices[searchable], np.flatnonzero(searchable)] = -np.inf
+
+        num_words = min(topn + num_extra, len(scores) - 1)
+        top = np.argpartition(-scores, num_words, axis=0)[:num_words]
+        top_scores = np.take_along_axis(scores, top, axis=0)
+        top = np.take_along_axis(top, np.argsort(-top_scores, axis=0), axis=0)
+
+        for column, i in enumerate(to_search):
+            similar_words[i] = [self.model.index_to_key[j] for j in top[:, column]]
+            self.cache.set(self.get_cache_key(answers[i]), similar_words[i])
+
+        return similar_words
+
+    def is_distractor(self, word, answer):
+        ''' Returns True if the word can be offered
+        as a wrong option of the answer: an alphabetic
+        word, not a stopword, other than the answer
+        '''
+        return word.isalpha() and word.lower() not in self.stop_words and word.lower() != answer.lower()
+
+    def get_all_options_dicts(self, answers, num_options, topn=15):
+        ''' This method returns, for every answer, a dict
+        of 'num_options' options out of which one is
+        correct and is the answer, or None if not enough
+        distractors were found for it. The similarities
+        of all the answers are computed in one pass, and
+        a distractor is used by at most one question
+        '''
+        all_similar_words = self.get_similar_words_many(
+            answers, topn, num_extra=num_options * len(answers))
+
+        # words which cannot be picked as distractors anymore
+        used_words = set(answers)
+        options_dicts = []
+
+        for answer, similar_words in zip(answers, all_similar_words):
+            if similar_words is None:
+                candidates = []
+            else:
+                # the least similar of the topn words first, then the extra words
+                candidates = similar_words[:topn][::-1] + similar_words[topn:]
+
+            num_distractors = num_options - 1
+            candidates = [word for word in dict.fromkeys(candidates) if self.is_distractor(word, answer)]
+            options = [word for word in candidates if word not in used_words][:num_distractors]
+
+            if len(options) < num_distractors:
+                # not enough neighbours left, take the closest document words
+                document_words = self.get_document_similar_words(answer, len(self.all_words))
+                known_words = set(candidates)
+                candidates += [word for word in dict.fromkeys(document_words)
+                               if self.is_distractor(word, answer) and word not in known_words]
+                options = [word for word in candidates if word not in used_words][:num_distractors]
+
+            if len(options) < num_distractors:
+                # tiny documents, allow distractors used by other questions
+                options += [word for word in candidates if word not in options][:num_distractors - len(options)]
+
+            if len(options) < num_distractors:
+                options_dicts.append(None)
+                continue
+
+            options.insert(random.randint(0, len(options)), answer)
+            options_dict = {i + 1: word for i, word in enumerate(options)}
+
+            used_words.update(options)
+            options_dicts.append(options_dict)
+
+        return options_dicts
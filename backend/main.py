@@ -1,15 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from transformers import pipeline
 import os
 import json
-import ast
 import textract
 import requests
 from ocr_processing import process_image
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 from workers import txt2questions
+from cache import LRUCache
+from singleflight import SingleFlight, content_key
+from summarization import ChunkedSummarizer
+from batching import MicroBatcher
+from extractive_summary import LexRankSummarizer, EXTRACTIVE_MODEL_NAME
+from summarizer_backends import load_summarizer, get_model_id
+from gemini_quiz import GeminiQuizGenerator, QuizGenerationError
+from prompt_compression import SalienceCompressor
+from quiz_router import QuizRouter
+from model_registry import preload as preload_models
+from incorrect_answer_generation import get_distractor_cache
 from pptx import Presentation
 from dotenv import load_dotenv
 from googletrans import Translator
@@ -33,11 +42,124 @@ app.secret_key = os.getenv('secret_key')
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 gemini_api_key=os.getenv('gemini_api_key')
 genai.configure(api_key=gemini_api_key)
-model = genai.GenerativeModel(model_name="gemini-1.5-pro-latest")
+GEMINI_MODEL_NAME = "gemini-1.5-pro-latest"
+model = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME)
+
+# quizzes already generated, keyed by a hash of the text, prompt version and model
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+quiz_cache = LRUCache(
+    max_entries=int(os.getenv('QUIZ_CACHE_SIZE', 1000)),
+    path=os.path.join(CACHE_DIR, 'quiz_cache.sqlite'),
+    max_disk_entries=int(os.getenv('QUIZ_CACHE_DISK_SIZE', 10000)),
+    ttl=float(os.getenv('QUIZ_CACHE_TTL', 7 * 24 * 3600)),
+)
+# identical jobs running at the same time (same content and parameters) share one computation
+quiz_flight = SingleFlight()
+summary_flight = SingleFlight()
+ocr_flight = SingleFlight()
+
+# summaries already generated, keyed by a hash of the text, the model and the summary length,
+# along with the chunk summaries of long texts, which do not depend on the length
+summary_cache = LRUCache(
+    max_entries=int(os.getenv('SUMMARY_CACHE_SIZE', 1000)),
+    max_bytes=int(os.getenv('SUMMARY_CACHE_MB', 64)) * 2 ** 20,
+    path=os.path.join(CACHE_DIR, 'summary_cache.sqlite'),
+    max_disk_entries=int(os.getenv('SUMMARY_CACHE_DISK_SIZE', 10000)),
+    ttl=float(os.getenv('SUMMARY_CACHE_TTL', 7 * 24 * 3600)),
+)
+
+# worker processes of the ner for large documents, each loads its own copy of the model
+NER_PROCESSES = int(os.getenv('NER_PROCESSES', 1))
+
+quiz_generator = GeminiQuizGenerator(
+    model, GEMINI_MODEL_NAME, cache=quiz_cache,
+    # longer texts are quizzed in concurrent chunks of this many tokens
+    chunk_token_budget=int(os.getenv('GEMINI_CHUNK_TOKENS', 30000)),
+    max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', 4)),
+    single_flight=quiz_flight,
+    # when set, only the most question-worthy sentences fitting in this many tokens are sent
+    compressor=SalienceCompressor(int(os.environ['GEMINI_PROMPT_TOKENS']), NER_PROCESSES) if os.getenv('GEMINI_PROMPT_TOKENS') else None,
+)
+
+# picks the local question generation or Gemini for each quiz, from the latency objective
+quiz_router = QuizRouter(
+    quiz_generator,
+    lambda text: txt2questions(text, quiz_generator.num_questions, quiz_generator.num_options, NER_PROCESSES),
+    latency_slo=float(os.getenv('QUIZ_LATENCY_SLO', 20)),
+    gemini_timeout=float(os.getenv('GEMINI_TIMEOUT', 60)),
+    gemini_capacity=int(os.getenv('GEMINI_MAX_CONCURRENCY', 4)),
+    local_capacity=int(os.getenv('LOCAL_QUIZ_CAPACITY', 1)),
+)
 # print(app.secret_key)
 
-bart_summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-bert_summarizer = pipeline("summarization", model="bert-base-uncased")
+BART_MODEL_NAME = "facebook/bart-large-cnn"
+
+# pytorch (float32, default), int8 (dynamically quantized) or onnx (onnxruntime)
+SUMMARIZER_BACKEND = os.getenv('SUMMARIZER_BACKEND', 'pytorch')
+BART_MODEL_ID = get_model_id(BART_MODEL_NAME, SUMMARIZER_BACKEND)
+bart_summarizer = load_summarizer(BART_MODEL_NAME, SUMMARIZER_BACKEND)
+
+# the bart requests of concurrent handlers are run together, as padded batches
+bart_batcher = MicroBatcher(
+    bart_summarizer,
+    max_batch_size=int(os.getenv('SUMMARY_MAX_BATCH', 8)),
+    max_wait=float(os.getenv('SUMMARY_MAX_WAIT_MS', 5)) / 1000,
+)
+
+# whole documents are summarized chunk by chunk, in batches of SUMMARY_BATCH_SIZE chunks
+bart_engine = ChunkedSummarizer(
+    bart_batcher, batch_size=int(os.getenv('SUMMARY_BATCH_SIZE', 8)),
+    cache=summary_cache, model_name=BART_MODEL_ID,
+)
+
+# extractive summaries rank the sentences themselves, no model is loaded
+extractive_engine = LexRankSummarizer()
+
+# max length of the summary for each length the user can pick, in tokens for bart and words for the extractive summaries
+SUMMARY_LENGTHS = {'short': 50, 'medium': 130, 'long': 250}
+
+# load the quiz models once, before any worker is forked
+preload_models()
+
+
+def run_summarizer(summarizer, model_name, text, max_length):
+    ''' Returns the summary of the text from the cache,
+    or computes it once for the identical requests
+    running at the same time
+    '''
+    key = f"summary:{model_name}:{max_length}:{content_key(text)}"
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return summary
+
+    def summarize():
+        summary = summarizer.summarize(text, max_length)
+        summary_cache.set(key, summary)
+        return summary
+
+    return summary_flight.do(key, summarize)
+
+
+def summarize_text(text, summary_type, summary_length):
+    ''' Returns the summary of the whole text for the
+    summary type and length selected by the user
+    '''
+    max_output_length = SUMMARY_LENGTHS.get(summary_length, 130)
+
+    if summary_type == 'abstractive':
+        return run_summarizer(bart_engine, BART_MODEL_ID, text, max_output_length)
+    elif summary_type == 'extractive':
+        return run_summarizer(extractive_engine, EXTRACTIVE_MODEL_NAME, text, max_output_length)
+    return "Invalid summary type selected."
+
+
+def run_ocr(filename, ocr_option):
+    ''' Returns the text of the image, extracted once
+    for the identical uploads running at the same time
+    '''
+    with open(filename, 'rb') as image_file:
+        key = content_key(image_file.read(), ocr_option)
+    return ocr_flight.do(key, process_image, filename, ocr_option)
 
 
 @app.route('/')
@@ -60,7 +182,7 @@ def upload_image():
             summary_type = request.form.get('summaryType')
             summary_length = request.form.get('summaryLength')
 
-            output_text = process_image(filename, performance)
+            output_text = run_ocr(filename, performance)
             output_filename = f"{filename}_output.txt"
 
             with open(output_filename, 'w') as output_file:
@@ -69,26 +191,8 @@ def upload_image():
             with open(output_filename, 'r', encoding="utf-8") as file:
                 text = file.read()
 
-            max_input_length = 512  # Model's input token limit
-
-            if summary_length == 'short':
-                max_output_length = 50
-            elif summary_length == 'medium':
-                max_output_length = 130
-            elif summary_length == 'long':
-                max_output_length = 250
-            else:
-                max_output_length = 130
-
-            truncated_text = text[:max_input_length]
-
             try:
-                if summary_type == 'abstractive':
-                    summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                elif summary_type == 'extractive':
-                    summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                else:
-                    summary = "Invalid summary type selected."
+                summary = summarize_text(text, summary_type, summary_length)
 
                 summary_filename = f"{filename}_summary.txt"
                 
@@ -130,26 +234,8 @@ def upload_pdf():
             # with open(text_filename, 'r', encoding="utf-8") as file:
             #     text = file.read()
 
-            max_input_length = 512  # Model's input token limit
-
-            if summary_length == 'short':
-                max_output_length = 50
-            elif summary_length == 'medium':
-                max_output_length = 130
-            elif summary_length == 'long':
-                max_output_length = 250
-            else:
-                max_output_length = 130
-
-            truncated_text = extracted_text[:max_input_length]
-
             try:
-                if summary_type == 'abstractive':
-                    summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                elif summary_type == 'extractive':
-                    summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                else:
-                    summary = "Invalid summary type selected."
+                summary = summarize_text(extracted_text, summary_type, summary_length)
 
                 summary_filename = f"{filename}_summary.txt"
                 
@@ -199,26 +285,8 @@ def upload_ppt():
             summary_type = request.form.get('summaryType')
             summary_length = request.form.get('summaryLength')
             
-            max_input_length = 512  # Model's input token limit
-
-            if summary_length == 'short':
-                max_output_length = 50
-            elif summary_length == 'medium':
-                max_output_length = 130
-            elif summary_length == 'long':
-                max_output_length = 250
-            else:
-                max_output_length = 130
-
-            truncated_text = extracted_text[:max_input_length]
-
             try:
-                if summary_type == 'abstractive':
-                    summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                elif summary_type == 'extractive':
-                    summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                else:
-                    summary = "Invalid summary type selected."
+                summary = summarize_text(extracted_text, summary_type, summary_length)
 
                 summary_filename = f"{filename}_summary.txt"
                 
@@ -254,26 +322,8 @@ def upload_doc():
             summary_type = request.form.get('summaryType')
             summary_length = request.form.get('summaryLength')
             
-            max_input_length = 512  # Model's input token limit
-
-            if summary_length == 'short':
-                max_output_length = 50
-            elif summary_length == 'medium':
-                max_output_length = 130
-            elif summary_length == 'long':
-                max_output_length = 250
-            else:
-                max_output_length = 130
-
-            truncated_text = extracted_text[:max_input_length]
-
             try:
-                if summary_type == 'abstractive':
-                    summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                elif summary_type == 'extractive':
-                    summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-                else:
-                    summary = "Invalid summary type selected."
+                summary = summarize_text(extracted_text, summary_type, summary_length)
 
                 summary_filename = f"{filename}_summary.txt"
                 
@@ -319,55 +369,11 @@ def quiz_pdf():
                     text = file.read()
 
                 global questions
-                
-                prompt = f"""
-                Generate exactly 10 multiple-choice questions (MCQs) from the text below.
-                Return only the dictionary itself, WITHOUT ASSIGNING IT TO A VARIABLE. No code fences, no explanation.
-                Return the result in the following Python dictionary format:
-
-                {{
-                    1: {{
-                        "question": "...",
-                        "answer": "...",
-                        "options": ["...", "...", "...", "..."]
-                    }},
-                    2: {{ ... }},
-                    ...
-                }}
-
-                Text:
-                {text}
-                """
-
-                # Generate MCQs using Gemini
-                response = model.generate_content(prompt)
-                content = response.text.strip()
-
-                # Debug: Log what we got from Gemini
-                print("RAW GEMINI RESPONSE:")
-                print(content)
-
-                if not content:
-                    return jsonify({'success': False, 'message': 'Gemini returned an empty response.'}), 500
-
-                # Remove markdown code fences (```json or ```)
-                content_clean = re.sub(r'^```[a-zA-Z]*|```$', '', content).strip()
-
-                # Extract dictionary block only
-                match = re.search(r'\{.*\}', content_clean, re.DOTALL)
-                if match:
-                    content_clean = match.group(0)
-                else:
-                    return jsonify({'success': False, 'message': 'Could not find dictionary content in Gemini response.'}), 500
 
                 try:
-                    questions = ast.literal_eval(content_clean)
-                except Exception as parse_err:
-                    return jsonify({
-                        'success': False,
-                        'message': f'Failed to parse dictionary from Gemini response: {parse_err}'
-                    }), 500
-
+                    questions = quiz_router.generate_questions(text)
+                except QuizGenerationError as e:
+                    return jsonify({'success': False, 'message': str(e)}), 500
 
                 if questions:
                     return jsonify({
@@ -420,53 +426,11 @@ def quiz_doc():
                     text = file.read()
 
                 global questions
-                prompt = f"""
-                Generate exactly 10 multiple-choice questions (MCQs) from the text below.
-                Return only the dictionary itself, WITHOUT ASSIGNING IT TO A VARIABLE. No code fences, no explanation.
-                Return the result in the following Python dictionary format:
-
-                {{
-                    1: {{
-                        "question": "...",
-                        "answer": "...",
-                        "options": ["...", "...", "...", "..."]
-                    }},
-                    2: {{ ... }},
-                    ...
-                }}
-
-                Text:
-                {text}
-                """
-
-                # Generate MCQs using Gemini
-                response = model.generate_content(prompt)
-                content = response.text.strip()
-
-                # Debug: Log what we got from Gemini
-                print("RAW GEMINI RESPONSE:")
-                print(content)
-
-                if not content:
-                    return jsonify({'success': False, 'message': 'Gemini returned an empty response.'}), 500
-
-                # Remove markdown code fences (```json or ```)
-                content_clean = re.sub(r'^```[a-zA-Z]*|```$', '', content).strip()
-
-                # Extract dictionary block only
-                match = re.search(r'\{.*\}', content_clean, re.DOTALL)
-                if match:
-                    content_clean = match.group(0)
-                else:
-                    return jsonify({'success': False, 'message': 'Could not find dictionary content in Gemini response.'}), 500
 
                 try:
-                    questions = ast.literal_eval(content_clean)
-                except Exception as parse_err:
-                    return jsonify({
-                        'success': False,
-                        'message': f'Failed to parse dictionary from Gemini response: {parse_err}'
-                    }), 500
+                    questions = quiz_router.generate_questions(text)
+                except QuizGenerationError as e:
+                    return jsonify({'success': False, 'message': str(e)}), 500
 
                 if questions:
                     return jsonify({
@@ -529,53 +493,11 @@ def quiz_ppt():
                 with open(text_filename, "r", encoding="utf-8") as file:
                     text = file.read()
                 global questions
-                prompt = f"""
-                Generate exactly 10 multiple-choice questions (MCQs) from the text below.
-                Return only the dictionary itself, WITHOUT ASSIGNING IT TO A VARIABLE. No code fences, no explanation.
-                Return the result in the following Python dictionary format:
-
-                {{
-                    1: {{
-                        "question": "...",
-                        "answer": "...",
-                        "options": ["...", "...", "...", "..."]
-                    }},
-                    2: {{ ... }},
-                    ...
-                }}
-
-                Text:
-                {text}
-                """
-
-                # Generate MCQs using Gemini
-                response = model.generate_content(prompt)
-                content = response.text.strip()
-
-                # Debug: Log what we got from Gemini
-                print("RAW GEMINI RESPONSE:")
-                print(content)
-
-                if not content:
-                    return jsonify({'success': False, 'message': 'Gemini returned an empty response.'}), 500
-
-                # Remove markdown code fences (```json or ```)
-                content_clean = re.sub(r'^```[a-zA-Z]*|```$', '', content).strip()
-
-                # Extract dictionary block only
-                match = re.search(r'\{.*\}', content_clean, re.DOTALL)
-                if match:
-                    content_clean = match.group(0)
-                else:
-                    return jsonify({'success': False, 'message': 'Could not find dictionary content in Gemini response.'}), 500
 
                 try:
-                    questions = ast.literal_eval(content_clean)
-                except Exception as parse_err:
-                    return jsonify({
-                        'success': False,
-                        'message': f'Failed to parse dictionary from Gemini response: {parse_err}'
-                    }), 500
+                    questions = quiz_router.generate_questions(text)
+                except QuizGenerationError as e:
+                    return jsonify({'success': False, 'message': str(e)}), 500
 
                 if questions:
                     return jsonify({
@@ -612,7 +534,7 @@ def process_image_route():
     filename = request.form.get('filename')
     ocr_option = request.form.get('ocr_option')
     
-    output_text = process_image(filename, ocr_option)
+    output_text = run_ocr(filename, ocr_option)
     output_filename = f"{filename}_output.txt"
     with open(output_filename, 'w') as output_file:
         output_file.write(output_text)
@@ -640,53 +562,10 @@ def quizup():
         with open(filename, 'r', encoding='utf-8') as file:
             text = file.read()
 
-        prompt = f"""
-        Generate exactly 10 multiple-choice questions (MCQs) from the text below.
-        Return only the dictionary itself, WITHOUT ASSIGNING IT TO A VARIABLE. No code fences, no explanation.
-        Return the result in the following Python dictionary format:
-
-        {{
-            1: {{
-                "question": "...",
-                "answer": "...",
-                "options": ["...", "...", "...", "..."]
-            }},
-            2: {{ ... }},
-            ...
-        }}
-
-        Text:
-        {text}
-        """
-
-        # Generate MCQs using Gemini
-        response = model.generate_content(prompt)
-        content = response.text.strip()
-
-        # Debug: Log what we got from Gemini
-        print("RAW GEMINI RESPONSE:")
-        print(content)
-
-        if not content:
-            return jsonify({'success': False, 'message': 'Gemini returned an empty response.'}), 500
-
-        # Remove markdown code fences (```json or ```)
-        content_clean = re.sub(r'^```[a-zA-Z]*|```$', '', content).strip()
-
-        # Extract dictionary block only
-        match = re.search(r'\{.*\}', content_clean, re.DOTALL)
-        if match:
-            content_clean = match.group(0)
-        else:
-            return jsonify({'success': False, 'message': 'Could not find dictionary content in Gemini response.'}), 500
-
         try:
-            questions = ast.literal_eval(content_clean)
-        except Exception as parse_err:
-            return jsonify({
-                'success': False,
-                'message': f'Failed to parse dictionary from Gemini response: {parse_err}'
-            }), 500
+            questions = quiz_router.generate_questions(text)
+        except QuizGenerationError as e:
+            return jsonify({'success': False, 'message': str(e)}), 500
 
         return jsonify({
             "success": True,
@@ -836,7 +715,7 @@ def success():
                     with open(filename, 'r') as file:
                         text = file.read()
 
-                    questions = txt2questions(text)
+                    questions = txt2questions(text, ner_processes=NER_PROCESSES)
                     
                     # print("\n\n\n\n\n")
                     # print(questions)
@@ -988,26 +867,8 @@ def link_upload():
         with open(text_filename, "w", encoding="utf-8") as text_file:
             text_file.write(extracted_text)
 
-        max_input_length = 512
-
-        if summary_length == 'short':
-            max_output_length = 50
-        elif summary_length == 'medium':
-            max_output_length = 130
-        elif summary_length == 'long':
-            max_output_length = 250
-        else:
-            max_output_length = 130
-
-        truncated_text = extracted_text[:max_input_length]
-
         try:
-            if summary_type == 'abstractive':
-                summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-            elif summary_type == 'extractive':
-                summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-            else:
-                summary = "Invalid summary type selected."
+            summary = summarize_text(extracted_text, summary_type, summary_length)
 
             summary_filename = "webpage_summary.txt"
             
@@ -1064,26 +925,8 @@ def video_upload():
             transcript_file.write(formatted_transcript)
 
         # Process the transcript to summarize
-        max_input_length = 512
-
-        if summary_length == 'short':
-            max_output_length = 50
-        elif summary_length == 'medium':
-            max_output_length = 130
-        elif summary_length == 'long':
-            max_output_length = 250
-        else:
-            max_output_length = 130
-
-        truncated_text = formatted_transcript[:max_input_length]
-
         try:
-            if summary_type == 'abstractive':
-                summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-            elif summary_type == 'extractive':
-                summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-            else:
-                summary = "Invalid summary type selected."
+            summary = summarize_text(formatted_transcript, summary_type, summary_length)
 
             summary_filename = f"{transcript_filename}_summary.txt"
             
@@ -1136,26 +979,8 @@ def txt_summarize():
         with open(filename, 'r') as file:
             text = file.read()
 
-        max_input_length = 512
-
-        if summary_length == 'short':
-            max_output_length = 50
-        elif summary_length == 'medium':
-            max_output_length = 130
-        elif summary_length == 'long':
-            max_output_length = 250
-        else:
-            max_output_length = 130
-
-        truncated_text = text[:max_input_length]
-
         try:
-            if summary_type == 'abstractive':
-                summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-            elif summary_type == 'extractive':
-                summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-            else:
-                summary = "Invalid summary type selected."
+            summary = summarize_text(text, summary_type, summary_length)
 
             summary_filename = f"{filename}_summary.txt"
             
@@ -1185,26 +1010,8 @@ def summarize():
     with open(filename, 'r', encoding="utf-8") as file:
         text = file.read()
 
-    max_input_length = 512  # Model's input token limit
-
-    if summary_length == 'short':
-        max_output_length = 50
-    elif summary_length == 'medium':
-        max_output_length = 130
-    elif summary_length == 'long':
-        max_output_length = 250
-    else:
-        max_output_length = 130
-
-    truncated_text = text[:max_input_length]
-
     try:
-        if summary_type == 'abstractive':
-            summary = bart_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-        elif summary_type == 'extractive':
-            summary = bert_summarizer(truncated_text, max_length=max_output_length, min_length=max_output_length // 2, do_sample=False)[0]['summary_text']
-        else:
-            summary = "Invalid summary type selected."
+        summary = summarize_text(text, summary_type, summary_length)
 
         summary_filename = f"{filename}_summary.txt"
         with open(summary_filename, 'w', encoding="utf-8") as summary_file:
@@ -1258,30 +1065,7 @@ def quiz():
         try:
             text = file.read().decode('utf-8')
 
-            prompt = f"""
-            Generate exactly 10 multiple-choice questions (MCQs) from the text below.
-            Return the result in the following Python dictionary format:
-
-            {{
-                1: {{
-                    "question": "...",
-                    "answer": "...",
-                    "options": ["...", "...", "...", "..."]
-                }},
-                2: {{ ... }},
-                ...
-            }}
-
-            Text:
-            {text}
-            """
-
-            # Generate MCQs using Gemini
-            response = model.generate_content(prompt)
-            content = response.text.strip()
-
-            # Safely evaluate the dictionary (assuming Gemini follows prompt format)
-            questions = eval(content)  # NOTE: safe only if you trust Gemini's output
+            questions = quiz_router.generate_questions(text)
 
             return jsonify({"success": True, "message": "Quiz generated successfully!", "questions": questions})
 
@@ -1297,6 +1081,64 @@ def quiz():
 
 
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/quiz-stream', methods=['POST'])
+def quiz_stream():
+    ''' Server-sent events variant of the quiz routes:
+    a "question" event is sent for every question as
+    soon as Gemini has generated it, then a "done"
+    event, or an "error" event
+    '''
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'success': False, 'message': 'No file was uploaded.'}), 400
+
+    file = request.files['file']
+    filename = file.filename
+    try:
+        if filename.lower().endswith('.txt'):
+            text = file.read().decode('utf-8')
+        elif filename.lower().endswith(('.pdf', '.doc', '.docx')):
+            file.save(filename)
+            text = textract.process(filename).decode('utf-8')
+        elif filename.lower().endswith('.pptx'):
+            file.save(filename)
+            prs = Presentation(filename)
+            text = "\n".join(
+                paragraph.text
+                for slide in prs.slides
+                for shape in slide.shapes if shape.has_text_frame
+                for paragraph in shape.text_frame.paragraphs)
+        else:
+            return jsonify({'success': False, 'message': 'Unsupported file type.'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error reading the file: {e}'}), 500
+
+    def generate():
+        global questions
+        streamed = {}
+        try:
+            for number, question in quiz_generator.stream_questions(text):
+                streamed[number] = question
+                yield sse_event("question", {"number": number, "question": question})
+        except QuizGenerationError as e:
+            yield sse_event("error", {"success": False, "message": str(e)})
+            return
+        except Exception as e:
+            yield sse_event("error", {"success": False, "message": f"Error processing quiz: {e}"})
+            return
+
+        questions = streamed
+        yield sse_event("done", {"success": True, "message": "Quiz generated successfully!", "total": len(streamed)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # do not let a proxy buffer the events
+    })
+
+
 @app.route('/results', methods=['POST'])
 def result():
     answers = request.json
@@ -1313,6 +1155,22 @@ def result():
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "distractor_cache": get_distractor_cache().stats(),
+        "quiz_cache": quiz_cache.stats(),
+        "summary_cache": summary_cache.stats(),
+        "quiz_router": quiz_router.stats(),
+        "summary_batching": bart_batcher.stats(),
+        "single_flight": {
+            "quiz": quiz_flight.stats(),
+            "summarization": summary_flight.stats(),
+            "ocr": ocr_flight.stats(),
+        },
+    })
+
+
 @app.route('/translate', methods=['POST'])
 def translate():
     try:
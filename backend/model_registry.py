@@ -0,0 +1,207 @@
+''' This module contains the process wide
+registry for the models used by the question
+generation pipeline, so that they are loaded
+once per process instead of once per quiz
+'''
+import os
+import threading
+
+import gensim.downloader as api
+import spacy
+from gensim.models import KeyedVectors
+
+from ann_index import RandomProjectionForest
+from compact_embeddings import CompactKeyedVectors
+from neighbour_table import NeighbourTable
+
+GLOVE_MODEL_NAME = "glove-wiki-gigaword-100"
+SPACY_MODEL_NAME = "en_core_web_md"
+
+# components of the spacy pipeline that the question extractor never uses,
+# only .ents is read so everything but the ner component is dropped
+# (the ner of the md model has its own internal tok2vec layer)
+NER_UNUSED_PIPES = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+# directory holding the memory-mappable copies of the models
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache")
+
+_lock = threading.Lock()
+_glove_models = dict()
+_compact_models = dict()
+_ner_models = dict()
+_ann_indexes = dict()
+_neighbour_tables = dict()
+
+
+def get_model_cache_dir():
+    ''' Returns the directory used to store
+    the memory-mappable model files. It can be
+    overridden with the KRUXX_MODEL_DIR env variable
+    '''
+    cache_dir = os.getenv("KRUXX_MODEL_DIR", MODEL_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_glove_path(name=GLOVE_MODEL_NAME):
+    ''' Returns the path of the native gensim
+    copy of the given embedding model
+    '''
+    return os.path.join(get_model_cache_dir(), f"{name}.kv")
+
+
+def export_glove_model(name=GLOVE_MODEL_NAME):
+    ''' Downloads (or reads from the gensim-data
+    directory) the given model and saves it in the
+    native gensim format, which keeps the vectors in
+    a separate .npy file that can be memory-mapped
+    '''
+    path = get_glove_path(name)
+    if not os.path.exists(path):
+        model = api.load(name)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        model.save(tmp_path)
+        # the vectors are saved next to the model as <path>.vectors.npy
+        os.replace(f"{tmp_path}.vectors.npy", f"{path}.vectors.npy")
+        os.replace(tmp_path, path)
+    return path
+
+
+def get_full_glove_model(name=GLOVE_MODEL_NAME):
+    ''' Returns the shared KeyedVectors for the
+    given model. The first call in a process loads
+    the vectors read-only through mmap, every later
+    call returns the same object
+    '''
+    model = _glove_models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if name not in _glove_models:
+            model = KeyedVectors.load(export_glove_model(name), mmap='r')
+            # norms are needed by every similarity query, compute them
+            # up front so forked workers share them copy-on-write
+            model.fill_norms()
+            _glove_models[name] = model
+    return _glove_models[name]
+
+
+def get_compact_path(name=GLOVE_MODEL_NAME):
+    ''' Returns the directory of the compact
+    float16 store of the given model
+    '''
+    return os.path.join(get_model_cache_dir(), f"{name}.compact")
+
+
+def get_compact_glove_model(name=GLOVE_MODEL_NAME):
+    ''' Returns the shared compact float16 store
+    of the given model (see compact_embeddings.py).
+    The EMBEDDING_MEMORY_MB env variable sets the
+    memory budget of the searched words
+    '''
+    model = _compact_models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if name not in _compact_models:
+            memory_budget_mb = os.getenv("EMBEDDING_MEMORY_MB")
+            _compact_models[name] = CompactKeyedVectors.load(
+                get_compact_path(name),
+                memory_budget_mb=float(memory_budget_mb) if memory_budget_mb else None
+            )
+    return _compact_models[name]
+
+
+def get_glove_model(name=GLOVE_MODEL_NAME):
+    ''' Returns the embedding model used by the
+    distractor generation: the compact store when
+    the EMBEDDING_STORE env variable is "compact"
+    and it has been built, the full model otherwise
+    '''
+    if os.getenv("EMBEDDING_STORE") == "compact" and os.path.isdir(get_compact_path(name)):
+        return get_compact_glove_model(name)
+    return get_full_glove_model(name)
+
+
+def get_glove_model_id(model, name=GLOVE_MODEL_NAME):
+    ''' Returns the identifier of the words searched
+    in the given model, as returned by get_glove_model:
+    the compact store only searches its num_searchable
+    most frequent words, so its neighbours differ
+    '''
+    if isinstance(model, CompactKeyedVectors):
+        return f"{name}:compact:{model.num_searchable}"
+    return name
+
+
+def get_ann_path(name=GLOVE_MODEL_NAME):
+    ''' Returns the directory of the approximate
+    nearest neighbour index of the given model
+    '''
+    return os.path.join(get_model_cache_dir(), f"{name}.ann")
+
+
+def get_ann_index(name=GLOVE_MODEL_NAME):
+    ''' Returns the shared, memory-mapped ANN index
+    of the given model, or None if it has not been
+    built (see ann_index.py)
+    '''
+    if name in _ann_indexes:
+        return _ann_indexes[name]
+
+    with _lock:
+        if name not in _ann_indexes:
+            path = get_ann_path(name)
+            _ann_indexes[name] = RandomProjectionForest.load(path) if os.path.isdir(path) else None
+    return _ann_indexes[name]
+
+
+def get_neighbour_table_path(name=GLOVE_MODEL_NAME):
+    ''' Returns the path of the precomputed
+    neighbour table of the given model
+    '''
+    return os.path.join(get_model_cache_dir(), f"{name}.neighbours.npy")
+
+
+def get_neighbour_table(name=GLOVE_MODEL_NAME):
+    ''' Returns the shared, memory-mapped neighbour
+    table of the given model, or None if it has not
+    been built (see neighbour_table.py)
+    '''
+    if name in _neighbour_tables:
+        return _neighbour_tables[name]
+
+    with _lock:
+        if name not in _neighbour_tables:
+            path = get_neighbour_table_path(name)
+            _neighbour_tables[name] = NeighbourTable.load(path) if os.path.exists(path) else None
+    return _neighbour_tables[name]
+
+
+def get_ner_model(name=SPACY_MODEL_NAME):
+    ''' Returns the shared NER-only spacy pipeline.
+    It is loaded once per process with the unused
+    components excluded and shared by all the
+    question extractors
+    '''
+    nlp = _ner_models.get(name)
+    if nlp is not None:
+        return nlp
+
+    with _lock:
+        if name not in _ner_models:
+            _ner_models[name] = spacy.load(name, exclude=NER_UNUSED_PIPES)
+    return _ner_models[name]
+
+
+def preload():
+    ''' Loads all the shared models. Call it before
+    forking workers (e.g. gunicorn --preload) so that
+    the children inherit the already loaded models
+    '''
+    get_glove_model()
+    get_ann_index()
+    get_neighbour_table()
+    get_ner_model()
@@ -0,0 +1,96 @@
+''' This module contains the precomputed table
+of the nearest neighbours of the vocabulary,
+which turns a neighbour query into a lookup.
+
+Build it once, offline, from the backend directory:
+    python -m neighbour_table --k 15 --words 100000
+'''
+import argparse
+
+import numpy as np
+
+
+class NeighbourTable:
+    ''' Row i of the table holds the ids of the k
+    words most similar to word i, most similar
+    first. Only the first rows of the vocabulary
+    (the most frequent words) need to be present
+    '''
+
+    def __init__(self, neighbours):
+        '''
+        Params:
+            * neighbours : (words x k) int32 array
+        '''
+        self.neighbours = neighbours
+
+    @classmethod
+    def build(cls, vectors, k=15, num_words=None, batch_size=128):
+        ''' Computes the table for the first num_words
+        rows of vectors, which should be unit-normalized.
+        The neighbours are searched in all the rows
+        '''
+        num_words = min(num_words or len(vectors), len(vectors))
+        neighbours = np.empty((num_words, k), dtype=np.int32)
+
+        for start in range(0, num_words, batch_size):
+            end = min(start + batch_size, num_words)
+            batch = np.arange(start, end)
+
+            scores = vectors[start:end] @ vectors.T
+            scores[batch - start, batch] = -np.inf  # a word is not its own neighbour
+
+            top = np.argpartition(-scores, k, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            neighbours[start:end] = np.take_along_axis(top, np.argsort(-top_scores, axis=1), axis=1)
+
+        return cls(neighbours)
+
+    def save(self, path):
+        np.save(path, self.neighbours)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        ''' Loads a saved table, memory-mapped
+        read-only by default
+        '''
+        return cls(np.load(path, mmap_mode=mmap_mode))
+
+    def most_similar(self, model, word, topn=15):
+        ''' Returns the topn words most similar to
+        word, most similar first, or None if the word
+        is not in the table. Raises KeyError if the
+        model does not know the word
+        '''
+        index = model.key_to_index[word]
+        if index >= len(self.neighbours) or topn > self.neighbours.shape[1]:
+            return None
+
+        neighbours = self.neighbours[index, :topn]
+        if neighbours.max() >= len(model.index_to_key):
+            # built from a larger vocabulary than the model's (pruned store)
+            return None
+
+        return [model.index_to_key[i] for i in neighbours]
+
+
+def main():
+    from model_registry import get_full_glove_model, get_neighbour_table_path
+
+    parser = argparse.ArgumentParser(description="Builds the neighbour table of the GloVe model")
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--words", type=int, default=None,
+                        help="number of most frequent words in the table, all by default")
+    parser.add_argument("--batch-size", type=int, default=128)
+    args = parser.parse_args()
+
+    model = get_full_glove_model()
+    vectors = np.asarray(model.vectors / model.norms[:, np.newaxis], dtype=np.float32)
+
+    table = NeighbourTable.build(vectors, k=args.k, num_words=args.words, batch_size=args.batch_size)
+    table.save(get_neighbour_table_path())
+    print(f"saved the neighbours of {len(table.neighbours)} words to {get_neighbour_table_path()}")
+
+
+if __name__ == '__main__':
+    main()
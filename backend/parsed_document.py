@@ -0,0 +1,48 @@
+''' This module contains the parsed representation
+of a document that is shared by the question
+extraction and incorrect answer generation modules
+'''
+from nltk.tokenize import word_tokenize
+from sentence_index import SentenceIndex
+
+
+class ParsedDocument:
+    ''' This class holds everything the question
+    pipeline needs from a document, computed in a
+    single pass over its sentences
+    '''
+
+    def __init__(self, sentences, stop_words=frozenset(), entities=None):
+        '''
+        Params:
+            * sentences : list<str>, the sentences of the document
+            * stop_words : set<str>, words to leave out of the filtered sentences
+            * entities : list<str>, the named entities, None if not extracted yet
+        '''
+        self.sentences = sentences
+
+        # the text the sentences came from, as given to the ner tagger
+        self.text = ''.join(sentence + ' ' for sentence in sentences)
+
+        self.tokenized_sentences = [word_tokenize(sentence) for sentence in sentences]
+
+        # True for every token which is a stopword
+        self.stopword_mask = [
+            [token in stop_words for token in tokens]
+            for tokens in self.tokenized_sentences
+        ]
+
+        # sentences cleaned of stopwords, used for the tf-idf scores
+        self.filtered_sentences = [
+            ' '.join(token for token, is_stopword in zip(tokens, mask) if not is_stopword)
+            for tokens, mask in zip(self.tokenized_sentences, self.stopword_mask)
+        ]
+
+        self.vocabulary = set()
+        for tokens in self.tokenized_sentences:
+            self.vocabulary.update(tokens)
+
+        # token -> sentences lookup
+        self.sentence_index = SentenceIndex(self.tokenized_sentences)
+
+        self.entities = entities
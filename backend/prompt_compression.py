@@ -0,0 +1,78 @@
+''' This module contains the optional compression
+of the texts sent to Gemini: only the sentences
+the local question extraction finds the most
+question-worthy are kept, up to a token budget
+'''
+import re
+
+from gemini_quiz import CHARS_PER_TOKEN, estimate_tokens
+from question_extraction import QuestionExtractor
+
+
+def truncate_text(text, token_budget):
+    ''' Returns the start of the text which fits in
+    the budget, cut on a word boundary when there
+    is one
+    '''
+    # the longest text estimate_tokens keeps within the budget
+    max_chars = token_budget * CHARS_PER_TOKEN - 1
+    if len(text) <= max_chars:
+        return text
+
+    # one more char, to know if the last word is complete
+    start = text[:max_chars + 1]
+    truncated = re.sub(r'\s+\S*$', '', start)
+    return truncated if truncated != start else start[:max_chars]
+
+
+class SalienceCompressor:
+    ''' Shortens a text to at most token_budget
+    (estimated) tokens by keeping its most salient
+    sentences, in their original order
+    '''
+
+    def __init__(self, token_budget, ner_processes=1):
+        '''
+        Params:
+            * token_budget : int, max tokens of a compressed text
+            * ner_processes : int, worker processes of the ner for large texts
+        '''
+        self.token_budget = token_budget
+        self.ner_processes = ner_processes
+
+        # part of the quiz cache key, quizzes of differently compressed texts differ
+        self.cache_id = f"salience-{token_budget}"
+
+    def compress(self, text):
+        ''' Returns the text itself if it fits in the
+        budget, else its most salient sentences. Text
+        without sentences that fit, e.g. unpunctuated
+        OCR or transcripts, is cut to the budget instead
+        '''
+        if estimate_tokens(text) <= self.token_budget:
+            return text
+
+        # an extractor per call, it keeps the state of the document it scores
+        extractor = QuestionExtractor(0, ner_processes=self.ner_processes)
+        document = extractor.parse_document(text)
+        try:
+            saliences = extractor.get_sentence_saliences(document)
+        except ValueError:
+            # nothing but stopwords to score, keep the first sentences
+            saliences = [(0.0, 0.0)] * len(document.sentences)
+
+        ranked = sorted(range(len(document.sentences)), key=lambda i: saliences[i], reverse=True)
+
+        kept = []
+        num_tokens = 0
+        for i in ranked:
+            sentence_tokens = estimate_tokens(document.sentences[i])
+            if num_tokens + sentence_tokens > self.token_budget:
+                continue
+            kept.append(i)
+            num_tokens += sentence_tokens
+
+        if not kept:
+            return truncate_text(text, self.token_budget)
+
+        return " ".join(document.sentences[i] for i in sorted(kept))
@@ -1,7 +1,13 @@
-import spacy
+import numpy as np
 from nltk.corpus import stopwords
 from nltk.tokenize import sent_tokenize, word_tokenize
 from sklearn.feature_extraction.text import TfidfVectorizer
+from model_registry import get_ner_model
+from parsed_document import ParsedDocument
+from sentence_chunks import chunk_sentences
+
+# size in characters of the chunks tagged in parallel for large documents
+NER_CHUNK_SIZE = 100000
 
 
 class QuestionExtractor:
@@ -10,15 +16,19 @@ class QuestionExtractor:
     a given document
     '''
 
-    def __init__(self, num_questions):
+    def __init__(self, num_questions, ner_processes=1):
 
         self.num_questions = num_questions
 
+        # worker processes for the chunked ner of large documents, more than
+        # one is opt-in: every process loads its own copy of the ner model
+        self.ner_processes = ner_processes
+
         # hash set for fast lookup
         self.stop_words = set(stopwords.words('english'))
 
-        # named entity recognition tagger
-        self.ner_tagger = spacy.load('en_core_web_md')
+        # named entity recognition tagger, shared by all the extractors
+        self.ner_tagger = get_ner_model()
 
         self.vectorizer = TfidfVectorizer()
 
@@ -33,12 +43,15 @@ class QuestionExtractor:
         }
 
         Params:
-            * document : string
+            * document : string or ParsedDocument
         Returns:
             * dict
         '''
+        document = self.parse_document(document)
+        self.questions_dict = dict()
+
         # find candidate keywords
-        self.candidate_keywords = self.get_candidate_entities(document)
+        self.candidate_keywords = document.entities
 
         # set word scores before ranking candidate keywords
         self.set_tfidf_scores(document)
@@ -51,6 +64,25 @@ class QuestionExtractor:
 
         return self.questions_dict
 
+    def parse_document(self, document):
+        ''' Returns the ParsedDocument for a document,
+        running the ner tagger if its entities have
+        not been extracted yet
+        Params:
+                * document: string, list of sentences or ParsedDocument
+        Returns:
+                * ParsedDocument
+        '''
+        if isinstance(document, str):
+            document = ParsedDocument(sent_tokenize(document), self.stop_words)
+        elif not isinstance(document, ParsedDocument):
+            document = ParsedDocument(document, self.stop_words)
+
+        if document.entities is None:
+            document.entities = self.get_candidate_entities(document.text, document.sentences)
+
+        return document
+
     def get_filtered_sentences(self, document):
         ''' Returns a list of sentences - each of
         which has been cleaned of stopwords.
@@ -73,56 +105,123 @@ class QuestionExtractor:
         words = word_tokenize(sentence)
         return ' '.join(w for w in words if w not in self.stop_words)
 
-    def get_candidate_entities(self, document):
+    def get_candidate_entities(self, document, sentences=None):
         ''' Returns a list of entities according to
         spacy's ner tagger. These entities are candidates
-        for the questions
+        for the questions. Documents longer than the
+        tagger's max_length are split into chunks on
+        sentence boundaries and tagged in parallel
 
         Params:
                 * document : string
+                * sentences : list<str>, the sentences of the document if already split
         Returns:
                 * list<str>
         '''
-        entities = self.ner_tagger(document)
+        if len(document) <= self.ner_tagger.max_length:
+            return self.get_entity_texts(self.ner_tagger(document))
+
+        if sentences is None:
+            sentences = sent_tokenize(document)
+        chunks = chunk_sentences(sentences, min(NER_CHUNK_SIZE, self.ner_tagger.max_length))
+
+        entity_list = []
+        for tagged_chunk in self.ner_tagger.pipe(chunks, batch_size=1, n_process=self.ner_processes):
+            entity_list.extend(self.get_entity_texts(tagged_chunk))
+
+        return list(set(entity_list))  # remove duplicates across chunks
+
+    def get_entity_texts(self, tagged_document):
+        ''' Returns the list of unique entity texts
+        of a document tagged by the ner tagger
+        '''
         entity_list = []
 
-        for ent in entities.ents:
+        for ent in tagged_document.ents:
             entity_list.append(ent.text)
 
         return list(set(entity_list))  # remove duplicates
 
     def set_tfidf_scores(self, document):
-        ''' Sets the tf-idf scores for each word'''
-        self.unfiltered_sentences = sent_tokenize(document)
-        self.filtered_sentences = self.get_filtered_sentences(document)
+        ''' Sets the tf-idf scores for each word
+        Params:
+                * document: string or ParsedDocument
+        '''
+        if not isinstance(document, ParsedDocument):
+            # the entities are not needed for the scores
+            document = ParsedDocument(sent_tokenize(document), self.stop_words)
 
-        self.word_score = dict()  # (word, score)
+        self.unfiltered_sentences = document.sentences
+        self.filtered_sentences = document.filtered_sentences
 
-        # (word, sentence where word score is max)
-        self.sentence_for_max_word_score = dict()
+        # token -> sentences lookup used to match the keywords
+        self.sentence_index = document.sentence_index
+        self.keyword_tokens = dict()  # (keyword, tokens)
 
         tf_idf_vector = self.vectorizer.fit_transform(self.filtered_sentences)
         feature_names = self.vectorizer.get_feature_names_out()
-        tf_idf_matrix = tf_idf_vector.todense().tolist()
 
         num_sentences = len(self.unfiltered_sentences)
-        num_features = len(feature_names)
 
-        for i in range(num_features):
-            word = feature_names[i]
-            self.sentence_for_max_word_score[word] = ""
-            tot = 0.0
-            cur_max = 0.0
+        # column-wise reductions over the sparse (sentence x word) matrix,
+        # csc keeps each word's scores contiguous
+        tf_idf_matrix = tf_idf_vector.tocsc()
+
+        # average score for each word
+        avg_scores = np.asarray(tf_idf_matrix.sum(axis=0)).ravel() / num_sentences
 
-            for j in range(num_sentences):
-                tot += tf_idf_matrix[j][i]
+        # sentence where each word has its max score (first one on ties)
+        max_sentence_ids = np.asarray(tf_idf_matrix.argmax(axis=0)).ravel()
 
-                if tf_idf_matrix[j][i] > cur_max:
-                    cur_max = tf_idf_matrix[j][i]
-                    self.sentence_for_max_word_score[word] = self.unfiltered_sentences[j]
+        # total score of each sentence
+        self.sentence_scores = np.asarray(tf_idf_vector.sum(axis=1)).ravel()
 
-            # average score for each word
-            self.word_score[word] = tot / num_sentences
+        # (word, score)
+        self.word_score = dict(zip(feature_names, avg_scores.tolist()))
+
+        # (word, id of the sentence where word score is max)
+        self.sentence_id_for_max_word_score = dict(zip(feature_names, max_sentence_ids.tolist()))
+
+        # (word, sentence where word score is max)
+        self.sentence_for_max_word_score = {
+            word: self.unfiltered_sentences[j]
+            for word, j in self.sentence_id_for_max_word_score.items()
+        }
+
+    def get_sentence_saliences(self, document):
+        ''' Returns how question-worthy each sentence
+        of the document is: the total score of the
+        candidate keywords it would be asked about,
+        then its tf-idf score to break ties
+        Params:
+                * document : string or ParsedDocument
+        Returns:
+                * list<(float, float)>, one per sentence
+        '''
+        document = self.parse_document(document)
+
+        self.candidate_keywords = document.entities
+        self.set_tfidf_scores(document)
+        self.rank_keywords()
+
+        sentence_ids = dict()
+        for i, sentence in enumerate(document.sentences):
+            sentence_ids.setdefault(sentence, i)
+
+        keyword_scores = np.zeros(len(document.sentences))
+        for score, _, sentence in self.candidate_triples:
+            if sentence:
+                keyword_scores[sentence_ids[sentence]] += score
+
+        return list(zip(keyword_scores.tolist(), self.sentence_scores.tolist()))
+
+    def get_keyword_tokens(self, keyword):
+        ''' Returns the tokens of a keyword, each
+        keyword is tokenized only once per document
+        '''
+        if keyword not in self.keyword_tokens:
+            self.keyword_tokens[keyword] = word_tokenize(keyword)
+        return self.keyword_tokens[keyword]
 
     def get_keyword_score(self, keyword):
         ''' Returns the score for a keyword
@@ -132,7 +231,7 @@ class QuestionExtractor:
             * float : score
         '''
         score = 0.0
-        for word in word_tokenize(keyword):
+        for word in self.get_keyword_tokens(keyword):
             if word in self.word_score:
                 score += self.word_score[word]
         return score
@@ -141,21 +240,22 @@ class QuestionExtractor:
         ''' Finds and returns a sentence containing
         the keywords
         '''
-        words = word_tokenize(keyword)
+        words = self.get_keyword_tokens(keyword)
+
+        # sentences containing every word of the keyword as a whole token
+        candidate_sentence_ids = self.sentence_index.sentences_with_all(words)
+        if not candidate_sentence_ids:
+            return ""
+
         for word in words:
 
-            if word not in self.sentence_for_max_word_score:
+            if word not in self.sentence_id_for_max_word_score:
                 continue
 
-            sentence = self.sentence_for_max_word_score[word]
-
-            all_present = True
-            for w in words:
-                if w not in sentence:
-                    all_present = False
+            sentence_id = self.sentence_id_for_max_word_score[word]
 
-            if all_present:
-                return sentence
+            if sentence_id in candidate_sentence_ids:
+                return self.unfiltered_sentences[sentence_id]
         return ""
 
     def rank_keywords(self):
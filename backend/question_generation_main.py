@@ -4,6 +4,7 @@ generation modules
 '''
 from question_extraction import QuestionExtractor
 from incorrect_answer_generation import IncorrectAnswerGenerator
+from parsed_document import ParsedDocument
 import re
 from nltk import sent_tokenize
 
@@ -13,39 +14,90 @@ class QuestionGeneration:
     to generate questions
     '''
 
-    def __init__(self, num_questions, num_options):
+    def __init__(self, num_questions, num_options, ner_processes=1):
         self.num_questions = num_questions
         self.num_options = num_options
-        self.question_extractor = QuestionExtractor(num_questions)
+        self.question_extractor = QuestionExtractor(num_questions, ner_processes)
 
-    def clean_text(self, text):
+    def clean_sentences(self, text):
+        ''' Splits the text into sentences and cleans
+        each of them, every sentence ends with a '.'
+        '''
         text = text.replace('\n', ' ')  # remove newline chars
         sentences = sent_tokenize(text)
-        cleaned_text = ""
+        cleaned_sentences = []
         for sentence in sentences:
             # remove non alphanumeric chars
             cleaned_sentence = re.sub(r'([^\s\w]|_)+', '', sentence)
 
             # substitute multiple spaces with single space
             cleaned_sentence = re.sub(' +', ' ', cleaned_sentence)
-            cleaned_text += cleaned_sentence
 
-            if cleaned_text[-1] == ' ':
-                cleaned_text[-1] = '.'
+            if cleaned_sentence.strip() == '':
+                continue
+
+            if cleaned_sentence[-1] == ' ':
+                cleaned_sentence = cleaned_sentence[:-1] + '.'
             else:
-                cleaned_text += '.'
+                cleaned_sentence += '.'
 
-            cleaned_text += ' '  # pad with space at end
+            cleaned_sentences.append(cleaned_sentence)
+        return cleaned_sentences
+
+    def clean_text(self, text):
+        cleaned_text = ""
+        for cleaned_sentence in self.clean_sentences(text):
+            cleaned_text += cleaned_sentence + ' '  # pad with space at end
         return cleaned_text
 
+    def parse_document(self, text):
+        ''' Cleans the text and parses it once
+        into the ParsedDocument shared by the
+        question and distractor generation
+        '''
+        return self.question_extractor.parse_document(self.clean_sentences(text))
+
+    def parse_documents(self, texts, batch_size=8):
+        ''' Cleans and parses many texts, streaming
+        them through the ner tagger in batches. Yields
+        the ParsedDocuments in the order of the texts
+        '''
+        extractor = self.question_extractor
+
+        def documents():
+            for text in texts:
+                document = ParsedDocument(self.clean_sentences(text), extractor.stop_words)
+                if len(document.text) > extractor.ner_tagger.max_length:
+                    # too long for a single call, tagged in chunks instead
+                    document.entities = extractor.get_candidate_entities(document.text, document.sentences)
+                    yield "", document
+                else:
+                    yield document.text, document
+
+        for tagged_document, document in extractor.ner_tagger.pipe(
+                documents(), as_tuples=True, batch_size=batch_size):
+            if document.entities is None:
+                document.entities = extractor.get_entity_texts(tagged_document)
+            yield document
+
     def generate_questions_dict(self, document):
-        document = self.clean_text(document)
+        if not isinstance(document, ParsedDocument):
+            document = self.parse_document(document)
         self.questions_dict = self.question_extractor.get_questions_dict(document)
         self.incorrect_answer_generator = IncorrectAnswerGenerator(document)
 
-        for i in range(1, self.num_questions + 1):
-            if i not in self.questions_dict:
-                continue
-            self.questions_dict[i]["options"] = self.incorrect_answer_generator.get_all_options_dict(self.questions_dict[i]["answer"], self.num_options)
+        question_numbers = [i for i in range(1, self.num_questions + 1) if i in self.questions_dict]
+        answers = [self.questions_dict[i]["answer"] for i in question_numbers]
+
+        # the distractors of all the questions are found in one pass
+        all_options = self.incorrect_answer_generator.get_all_options_dicts(answers, self.num_options)
+
+        # questions without enough options are dropped, the others are numbered from 1 again
+        questions = []
+        for i, options_dict in zip(question_numbers, all_options):
+            if options_dict is not None:
+                self.questions_dict[i]["options"] = options_dict
+                questions.append(self.questions_dict[i])
+        self.questions_dict = {i + 1: question for i, question in enumerate(questions)}
 
         return self.questions_dict
\ No newline at end of file
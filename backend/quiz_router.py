@@ -0,0 +1,246 @@
+''' This module contains the router which picks,
+for every quiz request, between the local question
+generation and Gemini, from the size of the text,
+the latency objective, the requests each engine is
+already running and its recent latencies
+'''
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+GEMINI = "gemini"
+LOCAL = "local"
+
+# consecutive Gemini failures after which it is skipped for the cooldown
+MAX_CONSECUTIVE_FAILURES = 3
+
+
+class EngineStats:
+    ''' The recent latencies and the load of an
+    engine, to estimate how long a new request
+    would take on it. Call its methods with the
+    router's lock held
+    '''
+
+    def __init__(self, prior_latency, capacity, window):
+        '''
+        Params:
+            * prior_latency : float, seconds assumed before any request is observed
+            * capacity : int, requests the engine runs at once without slowing down
+            * window : int, number of recent requests the estimate is based on
+        '''
+        self.prior_latency = prior_latency
+        self.capacity = capacity
+        self.samples = deque(maxlen=window)  # (text length, seconds)
+
+        self.in_flight = 0  # requests running or queued to run
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_failure_at = 0.0
+
+    def estimate(self, num_chars):
+        ''' Returns the expected latency in seconds
+        of a request for a text of num_chars chars
+        '''
+        if not self.samples:
+            latency = self.prior_latency
+        else:
+            sizes, latencies = zip(*self.samples)
+            if len(set(sizes)) < 2:
+                latency = float(np.mean(latencies))
+            else:
+                # latency grows linearly with the size of the text
+                slope, intercept = np.polyfit(sizes, latencies, 1)
+                latency = max(float(intercept + slope * num_chars), min(latencies))
+
+        # requests beyond the capacity wait for the running ones
+        return latency * (1 + max(0, self.in_flight + 1 - self.capacity) / self.capacity)
+
+    def observe(self, num_chars, seconds, succeeded=True):
+        self.samples.append((num_chars, seconds))
+        if succeeded:
+            self.consecutive_failures = 0
+
+    def fail(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_failure_at = time.monotonic()
+
+    def stats(self):
+        latencies = sorted(seconds for _, seconds in self.samples)
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "failures": self.failures,
+            "p50_latency": latencies[len(latencies) // 2] if latencies else None,
+            "p95_latency": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        }
+
+
+class QuizRouter:
+    ''' Sends every quiz request to Gemini when it is
+    expected to answer within the latency objective,
+    else to the local engine when it is, else to the
+    engine expected to be the fastest. A Gemini
+    request which fails or times out falls back to
+    the local engine. Cached Gemini quizzes are
+    returned without routing
+    '''
+
+    def __init__(self, gemini_generator, local_engine, latency_slo=20.0, gemini_timeout=60.0,
+                 gemini_capacity=4, local_capacity=1, window=50, failure_cooldown=60.0):
+        '''
+        Params:
+            * gemini_generator : GeminiQuizGenerator
+            * local_engine : function, text -> questions dict, the local question generation
+            * latency_slo : float, seconds a quiz should take
+            * gemini_timeout : float, seconds after which the local engine answers instead
+            * gemini_capacity : int, Gemini requests run at once
+            * local_capacity : int, local requests run at once without slowing down
+            * window : int, number of recent requests the latency estimates are based on
+            * failure_cooldown : float, seconds Gemini is skipped after repeated failures
+        '''
+        self.gemini_generator = gemini_generator
+        self.local_engine = local_engine
+        self.latency_slo = latency_slo
+        self.gemini_timeout = gemini_timeout
+        self.failure_cooldown = failure_cooldown
+
+        self.engines = {
+            GEMINI: EngineStats(prior_latency=15.0, capacity=gemini_capacity, window=window),
+            LOCAL: EngineStats(prior_latency=5.0, capacity=local_capacity, window=window),
+        }
+        self.routed = {GEMINI: 0, LOCAL: 0}
+        self.fallbacks = 0
+        self.lock = threading.Lock()
+
+        # the Gemini requests run here so that they can be given up on after the timeout
+        self.gemini_executor = ThreadPoolExecutor(max_workers=gemini_capacity)
+
+    def choose_engine(self, text):
+        ''' Returns the name of the engine the text
+        should be sent to
+        '''
+        with self.lock:
+            gemini = self.engines[GEMINI]
+            if gemini.consecutive_failures >= MAX_CONSECUTIVE_FAILURES \
+                    and time.monotonic() - gemini.last_failure_at < self.failure_cooldown:
+                return LOCAL
+
+            gemini_latency = gemini.estimate(len(text))
+            local_latency = self.engines[LOCAL].estimate(len(text))
+
+        if gemini_latency <= self.latency_slo:
+            return GEMINI
+        if local_latency <= self.latency_slo:
+            return LOCAL
+        return GEMINI if gemini_latency <= local_latency else LOCAL
+
+    def generate_questions(self, text):
+        ''' Returns the questions dict of the text,
+        in the same format with both engines
+        '''
+        # a cached quiz says nothing about the latency of the engines
+        questions = self.gemini_generator.get_cached_questions(text)
+        if questions is not None:
+            return questions
+
+        engine = self.choose_engine(text)
+        with self.lock:
+            self.routed[engine] += 1
+
+        if engine == GEMINI:
+            try:
+                return self.run_gemini(text)
+            except Exception as e:
+                print(f"Gemini quiz failed, falling back to the local engine: {e!r}")
+                with self.lock:
+                    self.fallbacks += 1
+
+        return self.run_engine(LOCAL, self.local_engine, text)
+
+    def run_gemini(self, text):
+        ''' Runs the Gemini request in the executor,
+        raises concurrent.futures.TimeoutError if it
+        takes longer than the timeout. A timeout is a
+        failure of Gemini. The request counts as in
+        flight from the moment it is queued, so that
+        the router sees the requests waiting for the
+        executor. A request still queued at the timeout
+        is cancelled, one already running keeps running
+        and counts as in flight until it ends
+        '''
+        stats = self.engines[GEMINI]
+        with self.lock:
+            stats.requests += 1
+            stats.in_flight += 1
+
+        timed_out = threading.Event()
+        try:
+            future = self.gemini_executor.submit(
+                self.run_request, GEMINI, self.gemini_generator.generate_new_questions, text, timed_out)
+        except Exception:
+            with self.lock:
+                stats.in_flight -= 1
+            raise
+
+        try:
+            return future.result(timeout=self.gemini_timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                timed_out.set()
+                stats.fail()
+                if future.cancel():
+                    # it never started, so run_request will not end it
+                    stats.in_flight -= 1
+            raise
+
+    def run_engine(self, engine, generate, text):
+        ''' Runs the request on the engine in the
+        calling thread and records its latency
+        '''
+        stats = self.engines[engine]
+        with self.lock:
+            stats.requests += 1
+            stats.in_flight += 1
+        return self.run_request(engine, generate, text)
+
+    def run_request(self, engine, generate, text, timed_out=None):
+        ''' Runs a request already counted as in flight
+        and records its latency. A request which already
+        timed out, per the timed_out Event, is not counted
+        as a failure again, nor as a success when it ends
+        '''
+        stats = self.engines[engine]
+
+        start = time.perf_counter()
+        try:
+            questions = generate(text)
+        except Exception:
+            with self.lock:
+                if timed_out is None or not timed_out.is_set():
+                    stats.fail()
+            raise
+        finally:
+            with self.lock:
+                stats.in_flight -= 1
+
+        with self.lock:
+            succeeded = timed_out is None or not timed_out.is_set()
+            stats.observe(len(text), time.perf_counter() - start, succeeded)
+        return questions
+
+    def stats(self):
+        ''' Returns the counters of the router,
+        for monitoring
+        '''
+        with self.lock:
+            return {
+                "routed": dict(self.routed),
+                "fallbacks": self.fallbacks,
+                "engines": {name: engine.stats() for name, engine in self.engines.items()},
+            }
@@ -0,0 +1,39 @@
+''' This module contains the packing of consecutive
+sentences into chunks of bounded size, used to split
+long documents for the ner tagger and for Gemini
+'''
+
+
+def chunk_sentences(sentences, chunk_size):
+    ''' Groups consecutive sentences into chunks
+    of at most chunk_size characters. A sentence
+    longer than chunk_size is split on whitespace
+    Params:
+            * sentences : list<str>
+            * chunk_size : int
+    Returns:
+            * list<str>
+    '''
+    chunks = []
+    chunk = ""
+    for sentence in sentences:
+        while len(sentence) > chunk_size:
+            split_at = sentence.rfind(' ', 0, chunk_size)
+            if split_at <= 0:
+                split_at = chunk_size
+            if chunk:
+                chunks.append(chunk)
+                chunk = ""
+            chunks.append(sentence[:split_at].rstrip())
+            sentence = sentence[split_at:].lstrip()
+
+        if not sentence:
+            continue
+        if chunk and len(chunk) + 1 + len(sentence) > chunk_size:
+            chunks.append(chunk)
+            chunk = ""
+        chunk = f"{chunk} {sentence}" if chunk else sentence
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
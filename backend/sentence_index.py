@@ -0,0 +1,51 @@
+''' This module contains the inverted index
+from tokens to the sentences they appear in
+'''
+
+
+class SentenceIndex:
+    ''' Maps every token of a document to the ids
+    of the sentences containing it, together with
+    the positions of the token in each sentence
+    '''
+
+    def __init__(self, tokenized_sentences):
+        '''
+        Params:
+            * tokenized_sentences : list<list<str>>, the tokens of each sentence
+        '''
+        # token -> {sentence id -> [positions]}
+        self.postings = dict()
+
+        for sentence_id, tokens in enumerate(tokenized_sentences):
+            for position, token in enumerate(tokens):
+                self.postings.setdefault(token, dict()).setdefault(sentence_id, []).append(position)
+
+    def sentences_with(self, token):
+        ''' Returns the ids of the sentences
+        containing the token
+        '''
+        return self.postings.get(token, dict()).keys()
+
+    def positions(self, token, sentence_id):
+        ''' Returns the positions of the token
+        in the given sentence
+        '''
+        return self.postings.get(token, dict()).get(sentence_id, [])
+
+    def sentences_with_all(self, tokens):
+        ''' Returns the set of ids of the sentences
+        containing every one of the tokens as a whole
+        token (not as part of a longer word)
+        '''
+        if not tokens:
+            return set()
+
+        # intersect starting from the rarest token
+        postings = sorted((self.sentences_with(token) for token in tokens), key=len)
+        sentence_ids = set(postings[0])
+        for sentence_ids_for_token in postings[1:]:
+            sentence_ids.intersection_update(sentence_ids_for_token)
+            if not sentence_ids:
+                break
+        return sentence_ids
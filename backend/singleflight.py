@@ -0,0 +1,97 @@
+''' This module contains the single-flight layer
+which lets concurrent identical jobs (same content,
+same parameters) share one computation
+'''
+import hashlib
+import threading
+
+
+def content_key(*parts):
+    ''' Returns a hash of the parts, which can be
+    str, bytes or any value with a stable repr
+    '''
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = repr(part).encode('utf-8')
+        # length prefix, so that ("ab", "c") and ("a", "bc") differ
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class Call:
+    ''' A computation in flight, waited on by the
+    callers that arrive while it runs
+    '''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    ''' Runs at most one computation per key at a
+    time: a call made while another call with the
+    same key is running waits for it and gets its
+    result (or its exception) instead of running
+    the computation again. Nothing is kept once the
+    computation is over, caching is left to callers
+    '''
+
+    def __init__(self):
+        self.calls = {}  # key -> Call in flight
+        self.lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        ''' Returns fn(*args, **kwargs), computed once
+        for all the concurrent calls with this key
+        '''
+        with self.lock:
+            call = self.calls.get(key)
+            follower = call is not None
+            if follower:
+                self.coalesced += 1
+            else:
+                call = self.calls[key] = Call()
+                self.executions += 1
+
+        if follower:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            with self.lock:
+                self.errors += 1
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        ''' Returns the counters of the layer,
+        for monitoring
+        '''
+        with self.lock:
+            calls = self.executions + self.coalesced
+            return {
+                "in_flight": len(self.calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "coalesced_rate": self.coalesced / calls if calls else 0.0,
+            }
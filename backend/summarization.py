@@ -0,0 +1,161 @@
+''' This module contains the summarization of whole
+documents with a transformers summarization pipeline:
+the text is split into chunks that fit in the model,
+the chunks are summarized in batches and their
+summaries are summarized again until they fit
+'''
+import hashlib
+
+from nltk.tokenize import sent_tokenize
+
+# input limit used when the tokenizer does not give a real one
+DEFAULT_MAX_INPUT_TOKENS = 1024
+
+# max tokens of the summary of every chunk, before the summaries are merged
+CHUNK_SUMMARY_TOKENS = 128
+
+
+class ChunkedSummarizer:
+    ''' Summarizes texts of any length with a
+    summarization pipeline, instead of cutting
+    them to the input limit of the model. The
+    reduced chunk summaries of a text can be cached,
+    so that only the final summary is computed again
+    for another summary length
+    '''
+
+    def __init__(self, summarizer, chunk_tokens=None, batch_size=8, chunk_summary_tokens=CHUNK_SUMMARY_TOKENS,
+                 cache=None, model_name=None):
+        '''
+        Params:
+            * summarizer : transformers summarization pipeline
+            * chunk_tokens : int, max tokens of a chunk, the model's input limit by default
+            * batch_size : int, chunks summarized at once
+            * chunk_summary_tokens : int, max tokens of the summary of a chunk
+            * cache : LRUCache of the reduced chunk summaries, None to disable it
+            * model_name : str, name of the model, part of the cache key
+        '''
+        self.summarizer = summarizer
+        self.cache = cache
+        self.model_name = model_name
+        self.tokenizer = summarizer.tokenizer
+        self.batch_size = batch_size
+        self.chunk_summary_tokens = chunk_summary_tokens
+
+        max_input_tokens = self.tokenizer.model_max_length
+        if not max_input_tokens or max_input_tokens > 100000:
+            # tokenizers without a configured limit report a huge number
+            max_input_tokens = DEFAULT_MAX_INPUT_TOKENS
+
+        # room for the special tokens added around every input
+        special_tokens = self.tokenizer.num_special_tokens_to_add()
+        self.chunk_tokens = min(chunk_tokens or max_input_tokens, max_input_tokens) - special_tokens
+
+        # at least two chunk summaries fit in a chunk, so that every reduction halves the chunks
+        self.chunk_summary_tokens = min(self.chunk_summary_tokens, self.chunk_tokens // 2)
+
+    def count_tokens(self, texts):
+        ''' Returns the number of tokens of every text,
+        tokenized in a single batch
+        '''
+        if not texts:
+            return []
+        return [len(ids) for ids in self.tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    def split_text(self, text):
+        ''' Returns the (chunk, number of tokens) pairs
+        of the text: consecutive sentences grouped up to
+        chunk_tokens tokens. A sentence longer than that
+        is cut into pieces of chunk_tokens tokens
+        '''
+        sentences = [sentence for sentence in sent_tokenize(text) if sentence.strip()]
+
+        chunks = []
+        chunk, chunk_length = [], 0
+        for sentence, length in zip(sentences, self.count_tokens(sentences)):
+            pieces = [(sentence, length)]
+            if length > self.chunk_tokens:
+                ids = self.tokenizer(sentence, add_special_tokens=False)["input_ids"]
+                pieces = [
+                    (self.tokenizer.decode(ids[start:start + self.chunk_tokens]), len(ids[start:start + self.chunk_tokens]))
+                    for start in range(0, len(ids), self.chunk_tokens)
+                ]
+
+            for piece, piece_length in pieces:
+                if chunk and chunk_length + piece_length > self.chunk_tokens:
+                    chunks.append((" ".join(chunk), chunk_length))
+                    chunk, chunk_length = [], 0
+                chunk.append(piece)
+                chunk_length += piece_length
+
+        if chunk:
+            chunks.append((" ".join(chunk), chunk_length))
+        return chunks
+
+    def summarize_chunks(self, chunks, max_length):
+        ''' Returns the summaries of the chunks, of at
+        most max_length tokens each, summarized in
+        batches of batch_size
+        '''
+        # the chunks are grouped by length, so that a batch is padded as little as possible
+        order = sorted(range(len(chunks)), key=lambda i: chunks[i][1])
+        summaries = [None] * len(chunks)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            # a summary is not longer than its chunk
+            batch_max_length = max(1, min(max_length, max(chunks[i][1] for i in batch)))
+            outputs = self.summarizer(
+                [chunks[i][0] for i in batch],
+                max_length=batch_max_length,
+                min_length=batch_max_length // 2,
+                do_sample=False,
+                truncation=True,
+                batch_size=self.batch_size,
+            )
+            for i, output in zip(batch, outputs):
+                summaries[i] = output['summary_text']
+        return summaries
+
+    def get_cache_key(self, text):
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"chunks:{self.model_name}:{self.chunk_tokens}:{self.chunk_summary_tokens}:{digest}"
+
+    def reduce_text(self, text):
+        ''' Returns a text of at most one chunk which
+        stands for the whole text: the text itself if
+        it fits, else the reduced chunk summaries
+        '''
+        chunks = self.split_text(text)
+        if len(chunks) <= 1:
+            return chunks[0][0] if chunks else ""
+
+        key = self.get_cache_key(text)
+        if self.cache is not None:
+            reduced = self.cache.get(key)
+            if reduced is not None:
+                return reduced
+
+        # map: summarize every chunk, then reduce the summaries until they fit in one chunk
+        while len(chunks) > 1:
+            summaries = self.summarize_chunks(chunks, self.chunk_summary_tokens)
+            chunks = self.split_text(" ".join(summaries))
+        reduced = chunks[0][0]
+
+        if self.cache is not None:
+            self.cache.set(key, reduced)
+        return reduced
+
+    def summarize(self, text, max_length, min_length=None):
+        ''' Returns the summary of the whole text, of
+        at most max_length tokens
+        '''
+        reduced = self.reduce_text(text)
+        if not reduced:
+            return ""
+
+        if min_length is None:
+            min_length = max_length // 2
+        return self.summarizer(
+            reduced, max_length=max_length, min_length=min_length, do_sample=False, truncation=True,
+        )[0]['summary_text']
@@ -0,0 +1,61 @@
+''' This module contains the loading of the
+summarization pipeline with one of the CPU
+inference backends, chosen at startup:
+    * pytorch : the float32 model, as published
+    * int8 : the linear layers dynamically quantized to int8
+    * onnx : the model exported to ONNX, run by onnxruntime
+      (needs `pip install optimum[onnxruntime]`)
+'''
+import os
+
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+
+from model_registry import get_model_cache_dir
+
+SUMMARIZER_BACKENDS = ("pytorch", "int8", "onnx")
+
+
+def get_onnx_path(model_name):
+    ''' Returns the directory of the ONNX export
+    of the given model
+    '''
+    return os.path.join(get_model_cache_dir(), "onnx", model_name.replace("/", "--"))
+
+
+def get_model_id(model_name, backend):
+    ''' Returns the identifier of the model run by
+    the backend, the summaries of the backends differ
+    '''
+    return model_name if backend == "pytorch" else f"{model_name}:{backend}"
+
+
+def load_summarizer(model_name, backend="pytorch"):
+    ''' Returns the summarization pipeline of the
+    model, run by the given backend
+    '''
+    if backend not in SUMMARIZER_BACKENDS:
+        raise ValueError(f"Unknown summarizer backend {backend!r}, expected one of {SUMMARIZER_BACKENDS}")
+
+    if backend == "pytorch":
+        return pipeline("summarization", model=model_name)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    if backend == "int8":
+        import torch
+
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+        # int8 weights for the linear layers, their activations are quantized on the fly
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    path = get_onnx_path(model_name)
+    if os.path.isdir(path):
+        model = ORTModelForSeq2SeqLM.from_pretrained(path)
+    else:
+        # exported once, then loaded from the model cache
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        model.save_pretrained(path)
+    return pipeline("summarization", model=model, tokenizer=tokenizer)
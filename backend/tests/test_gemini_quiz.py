@@ -0,0 +1,89 @@
+import json
+from types import SimpleNamespace
+
+from gemini_quiz import GeminiQuizGenerator, QuestionStreamParser, get_question_errors, get_response_questions
+
+
+def make_question(number, answer_index=0):
+    options = [f"option {number}.{i}" for i in range(4)]
+    return {"question": f"Question {number}?", "answer": options[answer_index], "options": options}
+
+
+class FakeModel:
+    ''' A Gemini model which returns the given
+    responses in order and records the prompts
+    '''
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        self.prompts.append(prompt)
+        text = json.dumps(self.responses.pop(0))
+        if stream:
+            return [SimpleNamespace(text=text[i:i + 5]) for i in range(0, len(text), 5)]
+        return SimpleNamespace(text=text)
+
+
+def test_stream_parser_ignores_braces_and_escaped_quotes_in_strings():
+    first = make_question(1)
+    first["question"] = 'What does "{x}" mean in a \\"} string?'
+    second = make_question(2)
+    second["options"][1] = "a } brace"
+    content = json.dumps({"questions": [first, second]})
+
+    parser = QuestionStreamParser()
+    completed = []
+    for position, char in enumerate(content):
+        for question in parser.feed(char):
+            completed.append((position, question))
+
+    # every question is returned as soon as its own closing brace arrives
+    assert [question for _, question in completed] == [first, second]
+    assert completed[0][0] == content.index(json.dumps(first)) + len(json.dumps(first)) - 1
+
+
+def test_stream_questions_yields_every_valid_question_once():
+    model = FakeModel([{"questions": [make_question(1), make_question(2)]}])
+    generator = GeminiQuizGenerator(model, "fake-model", num_questions=2, num_options=4)
+
+    assert list(generator.stream_questions("Some text.")) == [(1, make_question(1)), (2, make_question(2))]
+    assert len(model.prompts) == 1
+
+
+def test_schema_rejects_duplicate_options_and_foreign_answers():
+    assert get_question_errors(make_question(1), 4) == []
+
+    duplicated = make_question(1)
+    duplicated["options"][1] = duplicated["options"][0]
+    assert get_question_errors(duplicated, 4) == ['"options" must hold 4 distinct options']
+
+    foreign_answer = make_question(1)
+    foreign_answer["answer"] = "not an option"
+    assert get_question_errors(foreign_answer, 4) == ['"answer" must be one of the options']
+
+
+def test_repair_requests_only_the_missing_questions():
+    invalid = make_question(3)
+    invalid["answer"] = "not an option"
+    model = FakeModel([
+        {"questions": [make_question(1), make_question(2), invalid, make_question(1)]},
+        {"questions": [make_question(3), make_question(4)]},
+    ])
+    generator = GeminiQuizGenerator(model, "fake-model", num_questions=4, num_options=4)
+
+    questions = generator.generate_questions("Some text.")
+
+    assert len(model.prompts) == 2
+    assert "Generate exactly 2 valid multiple-choice questions" in model.prompts[1]
+    assert list(questions) == [1, 2, 3, 4]
+    assert [question["question"] for question in questions.values()] == [
+        "Question 1?", "Question 2?", "Question 3?", "Question 4?"]
+
+
+def test_legacy_numbered_questions_are_ordered_numerically():
+    data = {str(number): make_question(number) for number in (10, 2, 1, 11)}
+
+    assert [question["question"] for question in get_response_questions(data)] == [
+        "Question 1?", "Question 2?", "Question 10?", "Question 11?"]
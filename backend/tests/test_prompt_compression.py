@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+import prompt_compression
+from gemini_quiz import estimate_tokens
+from prompt_compression import SalienceCompressor
+
+
+class FakeExtractor:
+    ''' Splits on '. ' instead of running the ner,
+    every sentence is as salient
+    '''
+
+    def __init__(self, num_questions, ner_processes=None):
+        pass
+
+    def parse_document(self, text):
+        return SimpleNamespace(sentences=[sentence for sentence in text.split('. ') if sentence])
+
+    def get_sentence_saliences(self, document):
+        return [(0.0, 0.0)] * len(document.sentences)
+
+
+def test_unpunctuated_text_is_cut_on_a_word_boundary(monkeypatch):
+    monkeypatch.setattr(prompt_compression, "QuestionExtractor", FakeExtractor)
+    words = [f"word{i}" for i in range(200)]
+    text = " ".join(words)
+
+    compressed = SalienceCompressor(token_budget=50).compress(text)
+
+    assert compressed
+    assert estimate_tokens(compressed) <= 50
+    assert text.startswith(compressed)
+    assert compressed.split() == words[:len(compressed.split())]
+
+
+def test_sentences_which_fit_are_kept(monkeypatch):
+    monkeypatch.setattr(prompt_compression, "QuestionExtractor", FakeExtractor)
+    text = "First short sentence. " + "x" * 400
+
+    assert SalienceCompressor(token_budget=20).compress(text) == "First short sentence"
@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from quiz_router import GEMINI, LOCAL, MAX_CONSECUTIVE_FAILURES, QuizRouter
+
+
+class SlowGemini:
+    ''' A Gemini quiz generator which answers only
+    once released, long after the router's timeout
+    '''
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get_cached_questions(self, text):
+        return None
+
+    def generate_new_questions(self, text):
+        self.calls += 1
+        self.release.wait(5)
+        return {1: {"question": "gemini"}}
+
+
+def test_gemini_timeouts_trip_the_cooldown():
+    gemini = SlowGemini()
+    router = QuizRouter(gemini, lambda text: {1: {"question": "local"}}, gemini_timeout=0.01,
+                        gemini_capacity=MAX_CONSECUTIVE_FAILURES)
+    text = "some text"
+
+    for _ in range(MAX_CONSECUTIVE_FAILURES):
+        assert router.choose_engine(text) == GEMINI
+        assert router.generate_questions(text) == {1: {"question": "local"}}
+
+    assert router.stats()["fallbacks"] == MAX_CONSECUTIVE_FAILURES
+    assert router.stats()["engines"][GEMINI]["failures"] == MAX_CONSECUTIVE_FAILURES
+    assert router.choose_engine(text) == LOCAL
+
+    # the timed out requests ending late do not end the cooldown
+    gemini.release.set()
+    router.gemini_executor.shutdown(wait=True)
+    assert router.choose_engine(text) == LOCAL
+
+
+def test_queued_gemini_requests_route_to_local():
+    gemini = SlowGemini()
+    router = QuizRouter(gemini, lambda text: {1: {"question": "local"}}, gemini_capacity=4)
+    text = "some text"
+
+    results = []
+    threads = []
+    for i in range(5):
+        # the fifth request waits in the executor's queue, it still counts
+        assert router.choose_engine(text) == GEMINI
+        thread = threading.Thread(target=lambda: results.append(router.generate_questions(text)))
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 5
+        while router.stats()["engines"][GEMINI]["in_flight"] < i + 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    assert router.choose_engine(text) == LOCAL
+
+    gemini.release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [{1: {"question": "gemini"}}] * 5
+
+
+def test_queued_gemini_request_is_cancelled_on_timeout():
+    gemini = SlowGemini()
+    router = QuizRouter(gemini, lambda text: {1: {"question": "local"}}, gemini_timeout=0.05, gemini_capacity=1)
+    text = "some text"
+
+    # the first request occupies the only executor thread, the second times out in the queue
+    for _ in range(2):
+        with pytest.raises(FutureTimeoutError):
+            router.run_gemini(text)
+
+    gemini.release.set()
+    router.gemini_executor.shutdown(wait=True)
+    assert gemini.calls == 1
+    assert router.stats()["engines"][GEMINI]["in_flight"] == 0
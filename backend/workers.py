@@ -1,14 +1,73 @@
+from multiprocessing import Pool
+
+from model_registry import preload
 from question_generation_main import QuestionGeneration
 
-def txt2questions(doc: str, n=5, o=4) -> dict:
-    """ Get all questions and options """
+# question generator of a txt2questions_many worker process
+_worker_qGen = None
 
-    qGen = QuestionGeneration(n, o)
-    q = qGen.generate_questions_dict(doc)
+
+def format_questions(q: dict) -> dict:
+    """ Turn the options of every question into a list """
     for i in range(len(q)):
         temp = []
         for j in range(len(q[i + 1]['options'])):
             temp.append(q[i + 1]['options'][j + 1])
         # print(temp)
         q[i + 1]['options'] = temp
-    return q
\ No newline at end of file
+    return q
+
+
+def txt2questions(doc: str, n=5, o=4, ner_processes=1) -> dict:
+    """ Get all questions and options, the ner of large docs runs in ner_processes processes """
+
+    qGen = QuestionGeneration(n, o, ner_processes)
+    q = qGen.generate_questions_dict(doc)
+    return format_questions(q)
+
+
+def _generate(qGen, docs, batch_size):
+    """ Get the questions of every doc, the ner tagger runs over batches of docs """
+    for parsed_doc in qGen.parse_documents(docs, batch_size=batch_size):
+        yield format_questions(qGen.generate_questions_dict(parsed_doc))
+
+
+def _init_worker(n, o):
+    global _worker_qGen
+    # pool workers are daemonic and cannot start the ner processes of their own
+    _worker_qGen = QuestionGeneration(n, o, ner_processes=1)
+
+
+def _worker_generate_batch(docs):
+    return list(_generate(_worker_qGen, docs, len(docs)))
+
+
+def _batches(docs, batch_size):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def txt2questions_many(docs, n=5, o=4, batch_size=8, processes=1):
+    """ Get all questions and options for many documents.
+
+    The models are loaded once and reused for every document. Yields
+    the question dict of each document, in order, as soon as it is
+    ready. With processes > 1 the batches of documents are spread over
+    a pool of worker processes.
+    """
+    if processes <= 1:
+        qGen = QuestionGeneration(n, o)
+        yield from _generate(qGen, docs, batch_size)
+        return
+
+    # load the models before forking so the workers share them
+    preload()
+    with Pool(processes, initializer=_init_worker, initargs=(n, o)) as pool:
+        for questions in pool.imap(_worker_generate_batch, _batches(docs, batch_size)):
+            yield from questions